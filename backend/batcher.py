@@ -0,0 +1,140 @@
+"""
+batcher.py
+──────────
+Dynamic micro-batcher for LLM generation calls.
+
+Concurrent /ask requests each submit their prompt here; a single background
+task coalesces up to `max_batch_size` prompts arriving within `timeout_ms` of
+the first one and sends them through one `llm.abatch(...)` call. This shares
+client setup, connection reuse and rate-limit headroom across the burst, at
+the cost of at most `timeout_ms` extra latency for the first request.
+
+Retrieval stays per-request — only generation is batched.
+
+Off by default (timeout_ms=0): ChatGroq.abatch is just concurrent ainvoke()
+calls with no server-side batching, so the collection window adds latency
+without saving round trips. Enable it only for a provider whose abatch is a
+real batch endpoint.
+
+Lifecycle: main.py's lifespan calls start() on startup and stop() on shutdown.
+When the batcher is not running (disabled, CLI use, tests) submit() falls
+back to a direct ainvoke() so callers never need to care.
+"""
+
+import asyncio
+from collections.abc import Callable
+from typing import Any
+
+from logger import get_logger
+
+log = get_logger(__name__)
+
+
+def _fail_pending(items: list[tuple[list, asyncio.Future]]) -> None:
+    """Resolve every still-waiting future with an error so no caller hangs."""
+    for _, fut in items:
+        if not fut.done():
+            fut.set_exception(RuntimeError("LLM batcher stopped"))
+
+
+class LLMBatcher:
+    """Coalesce concurrent ainvoke() calls into batched abatch() calls."""
+
+    def __init__(
+        self,
+        llm_factory: Callable[[], Any],
+        *,
+        max_batch_size: int = 8,
+        timeout_ms: int = 50,
+    ) -> None:
+        self._llm_factory = llm_factory
+        self.max_batch_size = max_batch_size
+        self.timeout_s = timeout_ms / 1000.0
+        self._queue: asyncio.Queue[tuple[list, asyncio.Future]] | None = None
+        self._worker_task: asyncio.Task | None = None
+        self._inflight: set[asyncio.Task] = set()
+
+    @property
+    def running(self) -> bool:
+        return self._worker_task is not None and not self._worker_task.done()
+
+    async def start(self) -> None:
+        if self.running:
+            return
+        if self.timeout_s <= 0:
+            log.info("LLM batcher disabled — prompts go straight to the client")
+            return
+        self._queue = asyncio.Queue()
+        self._worker_task = asyncio.create_task(self._worker(), name="llm-batcher")
+        log.info(
+            "LLM batcher started — max_batch=%d, window=%.0f ms",
+            self.max_batch_size, self.timeout_s * 1000,
+        )
+
+    async def stop(self) -> None:
+        if self._worker_task is not None:
+            self._worker_task.cancel()
+            try:
+                await self._worker_task
+            except asyncio.CancelledError:
+                pass
+            self._worker_task = None
+        if self._inflight:
+            await asyncio.gather(*self._inflight, return_exceptions=True)
+        # Fail anything still queued so no caller waits forever
+        queued = []
+        while self._queue is not None and not self._queue.empty():
+            queued.append(self._queue.get_nowait())
+        _fail_pending(queued)
+        log.info("LLM batcher stopped")
+
+    async def submit(self, messages: list) -> Any:
+        """Queue one prompt and wait for its response message."""
+        if not self.running:
+            return await self._llm_factory().ainvoke(messages)
+        fut: asyncio.Future = asyncio.get_running_loop().create_future()
+        await self._queue.put((messages, fut))  # type: ignore[union-attr]
+        return await fut
+
+    async def _worker(self) -> None:
+        loop = asyncio.get_running_loop()
+        while True:
+            batch: list[tuple[list, asyncio.Future]] = []
+            try:
+                batch.append(await self._queue.get())  # type: ignore[union-attr]
+                deadline = loop.time() + self.timeout_s
+                while len(batch) < self.max_batch_size:
+                    remaining = deadline - loop.time()
+                    if remaining <= 0:
+                        break
+                    try:
+                        batch.append(await asyncio.wait_for(self._queue.get(), remaining))  # type: ignore[union-attr]
+                    except asyncio.TimeoutError:
+                        break
+            except asyncio.CancelledError:
+                # stop() cancelled us mid-collection — these were already
+                # taken off the queue, so stop()'s drain won't see them
+                _fail_pending(batch)
+                raise
+            # Dispatch without awaiting so the next batch can start collecting
+            task = asyncio.create_task(self._dispatch(batch))
+            self._inflight.add(task)
+            task.add_done_callback(self._inflight.discard)
+
+    async def _dispatch(self, batch: list[tuple[list, asyncio.Future]]) -> None:
+        log.debug("Dispatching LLM batch of %d prompt(s)", len(batch))
+        try:
+            results = await self._llm_factory().abatch(
+                [messages for messages, _ in batch],
+                config={"max_concurrency": self.max_batch_size},
+                return_exceptions=True,
+            )
+        except Exception as exc:
+            results = [exc] * len(batch)
+        for (_, fut), result in zip(batch, results):
+            if fut.done():
+                continue  # caller went away (request cancelled)
+            if isinstance(result, BaseException):
+                fut.set_exception(result)
+            else:
+                fut.set_result(result)
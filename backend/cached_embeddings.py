@@ -0,0 +1,159 @@
+"""
+cached_embeddings.py
+────────────────────
+Content-addressed cache in front of any LangChain `Embeddings` implementation.
+
+Design notes:
+  • Keys are SHA-256(model_name + "\\0" + text) so switching EMBEDDING_MODEL
+    never returns vectors produced by a different model. Callers put the
+    runtime in model_name too (e.g. "onnx-int8:all-MiniLM-L6-v2") so
+    EMBEDDING_BACKEND switches don't mix vector spaces either.
+  • Two tiers: an in-process LRU (OrderedDict) for hot queries, backed by an
+    optional SQLite file so re-ingesting unchanged chunks survives restarts.
+  • Vectors are stored as raw float32 bytes — compact and cheap to decode, and
+    embed_documents_array() hands them to FAISS as one contiguous matrix.
+  • Misses in embed_documents are sent to the wrapped model in ONE batch call,
+    then merged back in the original order.
+"""
+
+import hashlib
+import sqlite3
+import threading
+from collections import OrderedDict
+from pathlib import Path
+
+import numpy as np
+from langchain_core.embeddings import Embeddings
+
+from logger import get_logger
+
+log = get_logger(__name__)
+
+
+class CachedEmbeddings(Embeddings):
+    """Wrap an `Embeddings` object with an LRU + SQLite vector cache."""
+
+    def __init__(
+        self,
+        inner: Embeddings,
+        *,
+        model_name: str,
+        capacity: int = 10_000,
+        db_path: Path | None = None,
+    ) -> None:
+        self.inner = inner
+        self.model_name = model_name
+        self.capacity = capacity
+        self.db_path = db_path
+        self._lru: OrderedDict[bytes, bytes] = OrderedDict()
+        self._lock = threading.Lock()
+        self._db: sqlite3.Connection | None = None
+
+    # ── Keying / storage helpers ──────────────────────────────────────────────
+
+    def _key(self, text: str) -> bytes:
+        return hashlib.sha256(f"{self.model_name}\0{text}".encode("utf-8")).digest()
+
+    def _conn(self) -> sqlite3.Connection | None:
+        """Open the SQLite backing file lazily (None when persistence is disabled)."""
+        if self.db_path is None:
+            return None
+        if self._db is None:
+            try:
+                self.db_path.parent.mkdir(parents=True, exist_ok=True)
+                self._db = sqlite3.connect(str(self.db_path), check_same_thread=False)
+                self._db.execute(
+                    "CREATE TABLE IF NOT EXISTS emb_cache (hash BLOB PRIMARY KEY, vec BLOB NOT NULL)"
+                )
+            except sqlite3.Error as exc:
+                log.warning("Embedding cache disabled — could not open '%s': %s", self.db_path, exc)
+                self.db_path = None
+                return None
+        return self._db
+
+    def _remember(self, key: bytes, blob: bytes) -> None:
+        self._lru[key] = blob
+        self._lru.move_to_end(key)
+        if len(self._lru) > self.capacity:
+            self._lru.popitem(last=False)
+
+    def _get(self, key: bytes) -> bytes | None:
+        blob = self._lru.get(key)
+        if blob is not None:
+            self._lru.move_to_end(key)
+            return blob
+        db = self._conn()
+        if db is None:
+            return None
+        row = db.execute("SELECT vec FROM emb_cache WHERE hash = ?", (key,)).fetchone()
+        if row is None:
+            return None
+        self._remember(key, row[0])
+        return row[0]
+
+    def _put_many(self, items: list[tuple[bytes, bytes]]) -> None:
+        for key, blob in items:
+            self._remember(key, blob)
+        db = self._conn()
+        if db is None or not items:
+            return
+        try:
+            with db:
+                db.executemany("INSERT OR REPLACE INTO emb_cache (hash, vec) VALUES (?, ?)", items)
+        except sqlite3.Error as exc:
+            log.warning("Could not persist %d embedding(s): %s", len(items), exc)
+
+    @staticmethod
+    def _encode(vec: list[float]) -> bytes:
+        return np.asarray(vec, dtype=np.float32).tobytes()
+
+    @staticmethod
+    def _decode(blob: bytes) -> list[float]:
+        return np.frombuffer(blob, dtype=np.float32).tolist()
+
+    # ── Embeddings interface ──────────────────────────────────────────────────
+
+    def embed_query(self, text: str) -> list[float]:
+        key = self._key(text)
+        with self._lock:
+            blob = self._get(key)
+        if blob is not None:
+            return self._decode(blob)
+
+        blob = self._encode(self.inner.embed_query(text))
+        with self._lock:
+            self._put_many([(key, blob)])
+        return self._decode(blob)
+
+    def embed_documents(self, texts: list[str]) -> list[list[float]]:
+        return self.embed_documents_array(texts).tolist()
+
+    def embed_documents_array(self, texts: list[str]) -> np.ndarray:
+        """
+        Like embed_documents, but return one C-contiguous float32 matrix (N, dim).
+        Cached bytes are copied straight into the buffer — no per-float boxing.
+        """
+        if not texts:
+            return np.empty((0, 0), dtype=np.float32)
+        keys = [self._key(t) for t in texts]
+        blobs: list[bytes | None] = []
+        with self._lock:
+            for key in keys:
+                blobs.append(self._get(key))
+
+        # Deduplicate misses so identical chunks are embedded only once
+        miss_index: dict[bytes, int] = {}
+        miss_texts: list[str] = []
+        for key, text, blob in zip(keys, texts, blobs):
+            if blob is None and key not in miss_index:
+                miss_index[key] = len(miss_texts)
+                miss_texts.append(text)
+
+        if miss_texts:
+            log.debug("Embedding cache: %d hit(s), %d miss(es)", len(texts) - len(miss_texts), len(miss_texts))
+            fresh = [self._encode(v) for v in self.inner.embed_documents(miss_texts)]
+            with self._lock:
+                self._put_many([(key, fresh[i]) for key, i in miss_index.items()])
+            blobs = [b if b is not None else fresh[miss_index[k]] for k, b in zip(keys, blobs)]
+
+        return np.frombuffer(b"".join(blobs), dtype=np.float32).reshape(len(texts), -1)  # type: ignore[arg-type]
@@ -6,8 +6,12 @@ All values are loaded from environment variables (.env) via pydantic-settings.
 No module should ever call os.getenv() directly.
 """
 
+import os
+from functools import cached_property, lru_cache
 from pathlib import Path
-from pydantic import Field
+from typing import Literal
+
+from pydantic import Field, model_validator
 from pydantic_settings import BaseSettings, SettingsConfigDict
 
 
@@ -24,12 +28,63 @@ class Settings(BaseSettings):
         le=1.0,
         description="LLM sampling temperature (0 = deterministic, 1 = creative)",
     )
+    max_concurrent_llm_calls: int = Field(
+        default=8,
+        ge=1,
+        description="Max in-flight Groq requests per process (backpressure against rate limits)",
+    )
+    llm_max_batch_size: int = Field(
+        default=8, ge=1, description="Max prompts coalesced into one batched Groq dispatch"
+    )
+    llm_batch_timeout_ms: int = Field(
+        default=0,
+        ge=0,
+        description=(
+            "How long the batcher waits to fill a batch after the first prompt "
+            "(0 = batcher off; ChatGroq.abatch is client-side fan-out, so the wait only adds latency)"
+        ),
+    )
+    llm_timeout_seconds: float = Field(
+        default=30.0, gt=0.0, description="Read timeout for one Groq HTTP response before it is retried"
+    )
+    llm_max_retries: int = Field(
+        default=2, ge=0, description="Retries for failed or timed-out Groq requests"
+    )
+    warmup_llm: bool = Field(
+        default=False,
+        description="Send a 1-token ping to Groq at startup so the first request skips the TCP/TLS handshake",
+    )
 
     # ── Embeddings — HuggingFace (free, local) ───────────────────────────────
     embedding_model: str = Field(
         default="sentence-transformers/all-MiniLM-L6-v2",
         description="Sentence-transformer model for dense embeddings",
     )
+    embedding_backend: Literal["huggingface", "onnx"] = Field(
+        default="huggingface",
+        description="Embedding runtime: PyTorch sentence-transformers or int8 ONNX Runtime",
+    )
+    onnx_model_dir: str = Field(
+        default="./onnx_model",
+        description="Directory holding the exported int8 ONNX model + tokenizer",
+    )
+    embedding_threads: int = Field(
+        default=0,
+        ge=0,
+        description=(
+            "Intra-op threads for the embedding model, torch or ONNX Runtime "
+            "(0 = physical cores, approx. cpu_count // 2)"
+        ),
+    )
+    embedding_cache_capacity: int = Field(
+        default=10000,
+        ge=0,
+        description="Max vectors kept in the in-process embedding LRU cache",
+    )
+    embedding_cache_persist: bool = Field(
+        default=True,
+        description="Persist cached embeddings to <vector_store>/emb_cache.sqlite across restarts",
+    )
 
     # ── Paths ────────────────────────────────────────────────────────────────
     documents_path: str = Field(default="./documents", description="Folder with source documents")
@@ -48,39 +103,153 @@ class Settings(BaseSettings):
         description="Minimum similarity score to include a source (0 = include all)",
     )
 
+    retrieval_mode: Literal["topk", "threshold"] = Field(
+        default="topk",
+        description=(
+            "topk = fetch K nearest then filter by score; threshold = FAISS range search "
+            "returns only chunks at or above RETRIEVAL_SCORE_THRESHOLD (still capped at K)"
+        ),
+    )
+
+    max_context_tokens: int = Field(
+        default=3000,
+        ge=100,
+        description="Token budget for retrieved context in the prompt; lower-ranked chunks beyond it are dropped",
+    )
+
+    # ── FAISS index ────────────────────────────────────────────────────────────
+    faiss_index_type: Literal["flat", "hnsw", "ivfpq"] = Field(
+        default="hnsw",
+        description=(
+            "flat = exact O(N) search; hnsw = approximate O(log N) graph search; "
+            "ivfpq = inverted lists + product quantization (low memory, large corpora)"
+        ),
+    )
+    hnsw_m: int = Field(default=32, ge=4, le=128, description="HNSW neighbours per node")
+    hnsw_ef_construction: int = Field(
+        default=200, ge=16, description="HNSW build-time candidate list size (higher = better recall)"
+    )
+    hnsw_ef_search: int = Field(
+        default=64, ge=1, description="HNSW query-time candidate list size (higher = better recall)"
+    )
+    embedding_quantization: Literal["fp32", "fp16", "int8"] = Field(
+        default="fp32",
+        description=(
+            "Vector storage precision for flat/hnsw indexes: fp16 halves and int8 quarters "
+            "memory + bytes scanned per query (typical recall loss <1% for fp16)"
+        ),
+    )
+    ivf_nprobe: int = Field(
+        default=8, ge=1, description="IVF lists probed per query (higher = better recall, slower)"
+    )
+
+    # ── Semantic answer cache ────────────────────────────────────────────────
+    enable_semantic_cache: bool = Field(
+        default=True,
+        description="Return a cached answer when a new question is a near-duplicate of a previous one",
+    )
+    semantic_cache_threshold: float = Field(
+        default=0.97,
+        ge=0.0,
+        le=1.0,
+        description="Minimum cosine similarity between questions to count as a cache hit",
+    )
+    semantic_cache_min_jaccard: float = Field(
+        default=0.7,
+        ge=0.0,
+        le=1.0,
+        description="Minimum word-set overlap (Jaccard) with the cached question for a semantic hit (0 = off)",
+    )
+    semantic_cache_max_entries: int = Field(
+        default=1000, ge=1, description="Max answered questions kept in the semantic cache"
+    )
+    semantic_cache_ttl_seconds: float = Field(
+        default=3600.0, ge=0.0, description="Seconds a cached answer stays valid (0 = never expires)"
+    )
+    enable_llm_cache: bool = Field(
+        default=True,
+        description="Cache raw LLM responses by exact prompt in a local SQLite file",
+    )
+    llm_cache_path: str = Field(
+        default="./.langchain_cache.db", description="SQLite file for the LangChain LLM cache"
+    )
+
     # ── CORS ─────────────────────────────────────────────────────────────────
     cors_origins: str = Field(
         default="http://localhost:5173,http://localhost:3000",
         description="Comma-separated allowed CORS origins",
     )
+    cors_origins_parsed: tuple[str, ...] = Field(
+        default=(),
+        description="cors_origins split into a tuple at load time (derived — do not set)",
+    )
+
+    # ── HTTP compression ─────────────────────────────────────────────────────
+    gzip_level: int = Field(
+        default=6,
+        ge=0,
+        le=9,
+        description="GZip level for JSON responses (0 = compression off)",
+    )
+    gzip_min_size: int = Field(
+        default=1024,
+        ge=0,
+        description="Responses smaller than this many bytes are sent uncompressed",
+    )
 
     # ── Feature flags ────────────────────────────────────────────────────────
     enable_conversation_memory: bool = Field(
         default=True,
         description="Pass conversation history to the LLM for follow-up support",
     )
+    history_token_budget: int = Field(
+        default=1500,
+        ge=0,
+        description="Token budget for prior conversation turns; oldest turns beyond it are dropped",
+    )
 
     model_config = SettingsConfigDict(
         env_file=".env",
         env_file_encoding="utf-8",
         extra="ignore",
         case_sensitive=False,
+        ignored_types=(cached_property,),
     )
 
-    # ── Derived properties ────────────────────────────────────────────────────
+    @model_validator(mode="after")
+    def _parse_cors_origins(self) -> "Settings":
+        """Split the CSV origins once at construction instead of on every access."""
+        self.cors_origins_parsed = tuple(
+            o.strip() for o in self.cors_origins.replace(" ", ",").split(",") if o.strip()
+        )
+        return self
 
-    @property
-    def cors_origins_list(self) -> list[str]:
-        return [o.strip() for o in self.cors_origins.replace(" ", ",").split(",") if o.strip()]
+    # ── Derived properties ────────────────────────────────────────────────────
+    # cached_property: computed once per process instead of on every access.
 
-    @property
+    @cached_property
     def docs_path(self) -> Path:
         return Path(self.documents_path)
 
-    @property
+    @cached_property
     def store_path(self) -> Path:
         return Path(self.vector_store_path)
 
+    @cached_property
+    def embedding_num_threads(self) -> int:
+        """Resolved embedding thread count — one per physical core unless overridden."""
+        return self.embedding_threads or max(1, (os.cpu_count() or 2) // 2)
+
+    @cached_property
+    def onnx_model_path(self) -> Path:
+        return Path(self.onnx_model_dir)
+
+
+@lru_cache(maxsize=1)
+def get_settings() -> Settings:
+    """Build Settings once per process; later calls return the same instance."""
+    return Settings()
+
 
 # Singleton — import this everywhere
-settings = Settings()
+settings = get_settings()
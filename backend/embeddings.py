@@ -3,22 +3,74 @@ embeddings.py
 ─────────────
 Returns a cached HuggingFace embedding model (all-MiniLM-L6-v2).
 Completely free and runs locally — no API key needed.
+
+Set EMBEDDING_BACKEND=onnx to use the int8-quantized ONNX Runtime export
+(see onnx_embeddings.py) instead of the PyTorch checkpoint.
+
+The model is wrapped in CachedEmbeddings so repeated texts (same query asked
+twice, unchanged chunks on re-ingestion) never hit the model again.
 """
 
 from functools import lru_cache
+
+from langchain_core.embeddings import Embeddings
 from langchain_huggingface import HuggingFaceEmbeddings
+
+from cached_embeddings import CachedEmbeddings
 from config import settings
 from logger import get_logger
 
 log = get_logger(__name__)
 
 
+def _pin_torch_threads() -> None:
+    """
+    Limit torch to one thread per physical core. The default (one per logical
+    core) oversubscribes hyperthreads, which thrashes L2 and slows MiniLM GEMMs.
+    """
+    import torch
+
+    threads = settings.embedding_num_threads
+    torch.set_num_threads(threads)
+    try:
+        torch.set_num_interop_threads(1)
+    except RuntimeError:
+        pass  # interop pool already started — can only be set once per process
+    log.info("Torch threads pinned — intra_op=%d, inter_op=1", threads)
+
+
 @lru_cache(maxsize=1)
-def get_embeddings() -> HuggingFaceEmbeddings:
-    """Return a cached HuggingFace sentence-transformer embedding model."""
-    log.info("Initialising embeddings — model: %s", settings.embedding_model)
-    return HuggingFaceEmbeddings(
-        model_name=settings.embedding_model,
-        model_kwargs={"device": "cpu"},
-        encode_kwargs={"normalize_embeddings": True},
+def get_embeddings() -> Embeddings:
+    """Return a cached sentence-transformer embedding model."""
+    log.info(
+        "Initialising embeddings — model: %s (backend=%s)",
+        settings.embedding_model, settings.embedding_backend,
+    )
+    inner: Embeddings
+    if settings.embedding_backend == "onnx":
+        from onnx_embeddings import OnnxMiniLMEmbeddings
+        inner = OnnxMiniLMEmbeddings(
+            settings.onnx_model_path, num_threads=settings.embedding_num_threads
+        )
+    else:
+        _pin_torch_threads()
+        inner = HuggingFaceEmbeddings(
+            model_name=settings.embedding_model,
+            model_kwargs={"device": "cpu"},
+            encode_kwargs={"normalize_embeddings": True},
+        )
+        model = getattr(inner, "_client", None) or getattr(inner, "client", None)
+        if model is not None:
+            model.eval()
+
+    # Warm-up pass: faults mmap'd weights in and primes kernel caches before the first /ask
+    inner.embed_query("warmup")
+    # The runtime is part of the cache key: the int8 ONNX export and the fp32
+    # torch checkpoint of the same model produce slightly different vectors
+    variant = "onnx-int8" if settings.embedding_backend == "onnx" else settings.embedding_backend
+    return CachedEmbeddings(
+        inner,
+        model_name=f"{variant}:{settings.embedding_model}",
+        capacity=settings.embedding_cache_capacity,
+        db_path=settings.store_path / "emb_cache.sqlite" if settings.embedding_cache_persist else None,
     )
@@ -5,16 +5,28 @@ Lightweight append-only interaction log persisted as newline-delimited JSON (JSO
 
 Design notes:
   • JSONL is human-readable, grep-able, and trivially parseable.
+  • Serialised with orjson — UTF-8 bytes straight to disk, no str→bytes re-encode.
   • No database dependency — suitable for a local prototype.
   • In production this would be replaced by a proper database (Postgres/DynamoDB).
   • Each entry includes similarity scores on sources for evaluation purposes.
+  • Writes are queued and appended in batches by one background thread, so the
+    request handler never waits on disk I/O. The thread lingers briefly after
+    the first entry so bursts share a single write. Readers call flush() first
+    to see every entry logged so far.
 """
 
-import json
+import atexit
+import os
+import queue
+import threading
+from collections.abc import Iterator
 from datetime import datetime, timezone
 from pathlib import Path
+from time import monotonic, time
 from typing import Any
 
+import orjson
+
 from config import settings
 from logger import get_logger
 
@@ -22,9 +34,74 @@ log = get_logger(__name__)
 
 _HISTORY_FILE = Path("history.jsonl")
 
+_BATCH_SIZE = 256
+# After the first queued entry, wait this long for more so that steady, light
+# traffic still shares one append instead of one write per request
+_LINGER_SECONDS = 0.2
+# Queued by flush() to end the linger early; real entries are never empty
+_FLUSH = b""
+_q: queue.Queue[bytes] = queue.Queue(maxsize=10000)
+# Serialises the flusher's appends with clear()/delete_entry() rewrites
+_file_lock = threading.Lock()
+
+
+def _flusher() -> None:
+    """
+    Background consumer: block for one entry, then collect more until the batch
+    is full, _LINGER_SECONDS pass, or flush() asks for a write — and append once.
+    """
+    while True:
+        batch = [_q.get()]
+        deadline = monotonic() + _LINGER_SECONDS
+        while batch[-1] and len(batch) < _BATCH_SIZE:
+            remaining = deadline - monotonic()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(_q.get(timeout=remaining))
+            except queue.Empty:
+                break
+        data = b"".join(batch)
+        try:
+            if data:
+                with _file_lock, _HISTORY_FILE.open("ab", buffering=0) as fh:
+                    fh.write(data)
+        except OSError as exc:
+            log.warning("Could not write %d history entr(y/ies): %s", len(batch), exc)
+        finally:
+            for _ in batch:
+                _q.task_done()
+
+
+def flush() -> None:
+    """Block until every queued entry has been written to disk."""
+    _q.put(_FLUSH)
+    _q.join()
+
 
-def _now_iso() -> str:
-    return datetime.now(tz=timezone.utc).strftime("%Y-%m-%dT%H:%M:%SZ")
+threading.Thread(target=_flusher, name="history-flusher", daemon=True).start()
+atexit.register(flush)
+
+
+def _to_iso(ts: float) -> str:
+    return datetime.fromtimestamp(ts, tz=timezone.utc).strftime("%Y-%m-%dT%H:%M:%SZ")
+
+
+# Defaults for fields older log lines may lack — keeps the API shape fixed
+# now that GET /history returns entries without a response-model pass.
+_ENTRY_DEFAULTS: dict[str, Any] = {"answer": "", "chunks_retrieved": 0, "error": None}
+
+
+def _materialise(entry: dict[str, Any]) -> dict[str, Any]:
+    """Convert the stored epoch `ts` to the ISO `timestamp` the API exposes.
+    Entries written before the switch already carry `timestamp` and pass through."""
+    ts = entry.pop("ts", None)
+    if ts is not None and "timestamp" not in entry:
+        entry["timestamp"] = _to_iso(ts)
+    for key, default in _ENTRY_DEFAULTS.items():
+        entry.setdefault(key, default)
+    entry.setdefault("sources", [])
+    return entry
 
 
 def log_entry(
@@ -35,9 +112,9 @@ def log_entry(
     chunks_retrieved: int = 0,
     error: str | None = None,
 ) -> None:
-    """Append one interaction (success or failure) to the JSONL log."""
+    """Queue one interaction (success or failure) for appending to the JSONL log."""
     entry = {
-        "timestamp": _now_iso(),
+        "ts": time(),          # epoch seconds — formatted lazily on read
         "question": question,
         "answer": answer,
         "sources": sources or [],
@@ -45,32 +122,73 @@ def log_entry(
         "error": error,
     }
     try:
-        with _HISTORY_FILE.open("a", encoding="utf-8") as fh:
-            fh.write(json.dumps(entry, ensure_ascii=False) + "\n")
-    except OSError as exc:
-        log.warning("Could not write history entry: %s", exc)
+        _q.put_nowait(orjson.dumps(entry, option=orjson.OPT_APPEND_NEWLINE))
+    except queue.Full:
+        log.warning("History queue full — dropping entry for question %r", question[:60])
 
 
-def get_recent(n: int = 10) -> list[dict[str, Any]]:
-    """Return the last n entries from the history file (most recent last)."""
+def _tail_lines(n: int, block_size: int = 64 * 1024) -> list[bytes]:
+    """
+    Return the last n non-empty lines of the history file without reading it all.
+    Seeks from EOF and reads backwards in fixed-size blocks until enough
+    newlines have been seen, so cost is O(n · line size) rather than O(file).
+    """
+    with _HISTORY_FILE.open("rb") as fh:
+        fh.seek(0, 2)
+        pos = fh.tell()
+        buf = b""
+        lines: list[bytes] = []
+        while pos > 0:
+            read_size = min(block_size, pos)
+            pos -= read_size
+            fh.seek(pos)
+            buf = fh.read(read_size) + buf
+            lines = buf.split(b"\n")
+            # The first element may be a partial line unless we've reached BOF
+            if sum(1 for line in lines[1:] if line.strip()) >= n:
+                break
+        if pos > 0:
+            lines = lines[1:]
+    return [line for line in lines if line.strip()][-n:]
+
+
+def iter_recent(n: int = 10) -> Iterator[dict[str, Any]]:
+    """
+    Yield the last n entries from the history file (most recent last), one at
+    a time so callers can stream them. Unreadable lines are skipped.
+    """
+    flush()
     if not _HISTORY_FILE.exists():
-        return []
+        return
     try:
-        lines = _HISTORY_FILE.read_text(encoding="utf-8").splitlines()
-        entries = [json.loads(line) for line in lines if line.strip()]
-        return entries[-n:]
-    except (OSError, json.JSONDecodeError) as exc:
+        lines = _tail_lines(n)
+    except OSError as exc:
         log.warning("Could not read history: %s", exc)
-        return []
+        return
+    for line in lines:
+        try:
+            yield _materialise(orjson.loads(line))
+        except orjson.JSONDecodeError as exc:
+            log.warning("Skipping malformed history line: %s", exc)
+
+
+def get_recent(n: int = 10) -> list[dict[str, Any]]:
+    """Return the last n entries from the history file (most recent last)."""
+    return list(iter_recent(n))
 
 
 def clear() -> int:
     """Truncate the history file. Returns number of entries removed."""
+    flush()
     if not _HISTORY_FILE.exists():
         return 0
-    lines = _HISTORY_FILE.read_text(encoding="utf-8").splitlines()
-    count = sum(1 for line in lines if line.strip())
-    _HISTORY_FILE.write_text("", encoding="utf-8")
+    with _file_lock:
+        if not _HISTORY_FILE.stat().st_size:
+            return 0
+        # One entry per line: count newlines in 1 MiB blocks (C memchr, no UTF-8 decode)
+        with _HISTORY_FILE.open("rb") as fh:
+            count = sum(buf.count(b"\n") for buf in iter(lambda: fh.read(1 << 20), b""))
+        os.truncate(_HISTORY_FILE, 0)
     log.info("History cleared — %d entries removed", count)
     return count
 
@@ -79,16 +197,18 @@ def delete_entry(index: int) -> bool:
     """Delete a single entry by its 0-based index from the full history list.
     Returns True if an entry was deleted, False if index was out of range.
     """
+    flush()
     if not _HISTORY_FILE.exists():
         return False
     try:
-        lines = [l for l in _HISTORY_FILE.read_text(encoding="utf-8").splitlines() if l.strip()]
-        if index < 0 or index >= len(lines):
-            return False
-        del lines[index]
-        _HISTORY_FILE.write_text("\n".join(lines) + ("\n" if lines else ""), encoding="utf-8")
+        with _file_lock:
+            lines = [l for l in _HISTORY_FILE.read_text(encoding="utf-8").splitlines() if l.strip()]
+            if index < 0 or index >= len(lines):
+                return False
+            del lines[index]
+            _HISTORY_FILE.write_text("\n".join(lines) + ("\n" if lines else ""), encoding="utf-8")
         log.info("History entry %d deleted", index)
         return True
-    except (OSError, json.JSONDecodeError) as exc:
+    except OSError as exc:
         log.warning("Could not delete history entry %d: %s", index, exc)
         return False
@@ -5,10 +5,15 @@ Document ingestion pipeline:
   1. Load — read all .md / .txt / .pdf files from the documents folder.
   2. Split — RecursiveCharacterTextSplitter (chunk_size=500, overlap=50 by default).
   3. Embed — HuggingFace sentence-transformers (all-MiniLM-L6-v2, runs locally).
-  4. Store — persist FAISS index to disk.
+  4. Store — persist FAISS index to disk (HNSW graph by default; flat / IVFPQ via FAISS_INDEX_TYPE)
+     and the chunk texts + metadata to a SQLite docstore (docs.sqlite).
 
 Returns the FAISS vectorstore + document count so the caller can report stats.
 
+Re-ingestion is incremental: manifest.json (next to the index) records a
+SHA-256 per source file, and chunks of unchanged files keep their existing
+vectors instead of being re-embedded.
+
 Run standalone:
     python ingestor.py
 
@@ -16,43 +21,142 @@ Or trigger via API:
     POST /api/ingest
 """
 
+import hashlib
+import json
+import mmap
+import multiprocessing
+import os
 import sys
-from pathlib import Path
+from collections.abc import Iterator
+from concurrent.futures import ProcessPoolExecutor
+from functools import lru_cache
+from pathlib import Path, PurePosixPath
 
-from langchain.text_splitter import RecursiveCharacterTextSplitter
-from langchain_community.document_loaders import (
-    DirectoryLoader,
-    TextLoader,
-)
+import faiss
+import numpy as np
+from langchain_community.docstore.in_memory import InMemoryDocstore
 from langchain_community.vectorstores import FAISS
+from langchain_community.vectorstores.utils import DistanceStrategy
+from langchain_core.documents import Document
+from langchain_text_splitters import RecursiveCharacterTextSplitter
 
 from config import settings
 from embeddings import get_embeddings
 from logger import get_logger
+from retriever import get_vector_store, released_vector_store, vector_store_exists
+from sqlite_docstore import DOCSTORE_FILE, SQLiteDocstore
 
 log = get_logger(__name__)
 
-# ── Loader registry ────────────────────────────────────────────────────────────
-# Maps file extensions → loader class / kwargs.
-# Add new formats here (e.g. PyPDFLoader) without touching the rest of the code.
-LOADER_MAP = {
-    "**/*.md":  (TextLoader, {"encoding": "utf-8", "autodetect_encoding": True}),
-    "**/*.txt": (TextLoader, {"encoding": "utf-8", "autodetect_encoding": True}),
+# ── Supported formats ──────────────────────────────────────────────────────────
+# Plain-text formats are read directly into Documents; PDFs go through PyPDFLoader.
+TEXT_EXTENSIONS = {"md", "txt"}
+PDF_EXTENSIONS = {"pdf"}
+
+# Chunks per embed_documents call. Batches run one after another: each already
+# uses every thread settings.embedding_num_threads grants torch/ONNX Runtime,
+# so concurrent batches would only oversubscribe the cores.
+_EMBED_BATCH_SIZE = 64
+
+_MANIFEST_FILE = "manifest.json"
+
+# Scalar quantizer per EMBEDDING_QUANTIZATION setting (fp32 = store raw vectors)
+_SQ_TYPES = {
+    "fp16": faiss.ScalarQuantizer.QT_fp16,
+    "int8": faiss.ScalarQuantizer.QT_8bit,
 }
 
-# PDF support is optional — only include if unstructured is available
-try:
-    from langchain_community.document_loaders import PyPDFLoader  # noqa: F401
-    LOADER_MAP["**/*.pdf"] = (PyPDFLoader, {})
+# IVFPQ: 8-bit PQ codes; FAISS wants ~39 training points per centroid
+_PQ_NBITS = 8
+_MIN_TRAIN_PER_CENTROID = 39
+
+# Text files at or above this size are read via mmap (one copy instead of two)
+_MMAP_THRESHOLD = 1024 * 1024
+
+
+@lru_cache(maxsize=1)
+def _get_pdf_loader():
+    """
+    Import PyPDFLoader on first use. PDF support is optional, and deferring the
+    import keeps pypdf off the API server's startup path when nothing is ingested.
+    """
+    try:
+        from langchain_community.document_loaders import PyPDFLoader
+    except ImportError:
+        log.debug("PyPDFLoader not available — PDFs will be skipped")
+        return None
     log.debug("PDF loader available")
-except ImportError:
-    log.debug("PyPDFLoader not available — PDFs will be skipped")
+    return PyPDFLoader
+
+
+def _walk(path: str) -> Iterator[os.DirEntry]:
+    """Yield every non-hidden file under path in one recursive os.scandir pass."""
+    with os.scandir(path) as it:
+        entries = sorted(it, key=lambda e: e.name)
+    for entry in entries:
+        if entry.name.startswith("."):
+            continue
+        if entry.is_dir(follow_symlinks=False):
+            yield from _walk(entry.path)
+        elif entry.is_file():
+            yield entry
+
+
+def _decode_utf8(data, path: str) -> str:
+    """
+    Decode as UTF-8 without charset sniffing. Non-UTF-8 files are logged and
+    decoded with replacement characters rather than run through chardet.
+    """
+    try:
+        return str(data, "utf-8")
+    except UnicodeDecodeError as exc:
+        log.warning("'%s' is not valid UTF-8 (%s) — undecodable bytes replaced", path, exc.reason)
+        return str(data, "utf-8", errors="replace")
+
+
+def _filename(path: str) -> str:
+    """Display name stored once per document so retrieval never re-splits paths."""
+    return PurePosixPath(path.replace("\\", "/")).name
+
+
+def _fast_load(path: str, size: int) -> Document:
+    """
+    Read a text file into a Document. Large files are mmap'd and decoded in
+    one pass, avoiding the intermediate bytes copy of a buffered read().
+    """
+    if size >= _MMAP_THRESHOLD:
+        with open(path, "rb") as fh, mmap.mmap(fh.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            digest = hashlib.sha256(mm).hexdigest()
+            text = _decode_utf8(mm, path)
+    else:
+        raw = Path(path).read_bytes()
+        digest = hashlib.sha256(raw).hexdigest()
+        text = _decode_utf8(raw, path)
+    return Document(page_content=text, metadata={
+        "source": path, "filename": _filename(path), "content_hash": digest,
+    })
+
+
+def _load_one_pdf(path: str) -> list[Document]:
+    """Parse one PDF (runs in a worker process — pypdf is pure-Python and CPU-bound)."""
+    try:
+        digest = hashlib.sha256(Path(path).read_bytes()).hexdigest()
+        pages = _get_pdf_loader()(path).load()
+        name = _filename(path)
+        for page in pages:
+            page.metadata["filename"] = name
+            page.metadata["content_hash"] = digest
+        return pages
+    except Exception as exc:
+        log.warning("Skipping unreadable PDF '%s': %s", path, exc)
+        return []
 
 
 def load_documents(docs_path: Path) -> list:
     """
     Load all supported documents from docs_path.
-    Uses per-extension loaders so each file type is handled correctly.
+    Walks the tree once: .md / .txt are read straight into Documents,
+    PDFs are handed to PyPDFLoader.
     """
     if not docs_path.exists():
         raise FileNotFoundError(
@@ -60,21 +164,42 @@ def load_documents(docs_path: Path) -> list:
             "Create it and add your documents."
         )
 
-    all_docs = []
-    for glob_pattern, (loader_cls, loader_kwargs) in LOADER_MAP.items():
-        loader = DirectoryLoader(
-            str(docs_path),
-            glob=glob_pattern,
-            loader_cls=loader_cls,
-            loader_kwargs=loader_kwargs if loader_kwargs else None,
-            show_progress=False,
-            use_multithreading=True,
-            silent_errors=True,
-        )
-        docs = loader.load()
-        if docs:
-            log.info("Loaded %d file(s) via %s (pattern=%s)", len(docs), loader_cls.__name__, glob_pattern)
-        all_docs.extend(docs)
+    text_docs: list[Document] = []
+    pdf_paths: list[str] = []
+    for entry in _walk(str(docs_path)):
+        ext = entry.name.rsplit(".", 1)[-1].lower() if "." in entry.name else ""
+        if ext in TEXT_EXTENSIONS:
+            try:
+                text_docs.append(_fast_load(entry.path, entry.stat().st_size))
+            except OSError as exc:
+                log.warning("Skipping unreadable file '%s': %s", entry.path, exc)
+        elif ext in PDF_EXTENSIONS:
+            pdf_paths.append(entry.path)
+
+    all_docs: list[Document] = list(text_docs)
+    if text_docs:
+        log.info("Loaded %d text file(s)", len(text_docs))
+
+    if pdf_paths:
+        if _get_pdf_loader() is None:
+            log.warning("Skipping %d PDF(s) — PyPDFLoader not available", len(pdf_paths))
+        else:
+            pdf_docs: list[Document] = []
+            if len(pdf_paths) == 1:
+                pdf_docs.extend(_load_one_pdf(pdf_paths[0]))
+            else:
+                # spawn, not fork: /ingest runs in a worker thread of a process that
+                # already holds torch/FAISS/OpenMP pools and the history writer
+                # thread, and forking a multi-threaded process can deadlock.
+                # Parsing is CPU-bound, so one worker per physical core.
+                with ProcessPoolExecutor(
+                    max_workers=min(len(pdf_paths), settings.embedding_num_threads),
+                    mp_context=multiprocessing.get_context("spawn"),
+                ) as ex:
+                    for docs in ex.map(_load_one_pdf, pdf_paths, chunksize=4):
+                        pdf_docs.extend(docs)
+            log.info("Loaded %d page(s) from %d PDF(s)", len(pdf_docs), len(pdf_paths))
+            all_docs.extend(pdf_docs)
 
     if not all_docs:
         raise ValueError(
@@ -86,6 +211,18 @@ def load_documents(docs_path: Path) -> list:
     return all_docs
 
 
+@lru_cache(maxsize=4)
+def _get_splitter(chunk_size: int, chunk_overlap: int) -> RecursiveCharacterTextSplitter:
+    """Build the text splitter once per (chunk_size, chunk_overlap) pair."""
+    return RecursiveCharacterTextSplitter(
+        chunk_size=chunk_size,
+        chunk_overlap=chunk_overlap,
+        length_function=len,
+        add_start_index=True,      # persists character offset in metadata
+        separators=["\n\n", "\n", ". ", " ", ""],
+    )
+
+
 def split_documents(documents: list) -> list:
     """
     Split documents into overlapping chunks optimised for RAG retrieval.
@@ -93,13 +230,7 @@ def split_documents(documents: list) -> list:
     chunk_size and chunk_overlap are read from settings so they can be
     adjusted via .env without touching code.
     """
-    splitter = RecursiveCharacterTextSplitter(
-        chunk_size=settings.chunk_size,
-        chunk_overlap=settings.chunk_overlap,
-        length_function=len,
-        add_start_index=True,      # persists character offset in metadata
-        separators=["\n\n", "\n", ". ", " ", ""],
-    )
+    splitter = _get_splitter(settings.chunk_size, settings.chunk_overlap)
     chunks = splitter.split_documents(documents)
     log.info(
         "Split %d documents → %d chunks (size=%d, overlap=%d)",
@@ -109,23 +240,204 @@ def split_documents(documents: list) -> list:
     return chunks
 
 
-def build_vector_store(chunks: list) -> FAISS:
-    """Embed chunks and build the FAISS index."""
+def _new_index(vectors: np.ndarray) -> faiss.Index:
+    """
+    Create an empty FAISS index of the configured type for these vectors.
+
+      flat  — exact O(N·d) scan; best recall, fine for small corpora.
+      hnsw  — graph search, ~O(log N) per query with >95% recall@5.
+      ivfpq — inverted lists + product quantization: sublinear search and
+              ~8–32× less RAM, but lossy and needs enough vectors to train
+              (falls back to flat when the corpus is too small).
+
+    All types use inner product on L2-normalised vectors, so search scores are
+    cosine similarities directly.
+
+    flat and hnsw store vectors as fp32 unless EMBEDDING_QUANTIZATION is fp16
+    (2× fewer bytes streamed per query) or int8 (4×); ivfpq is already compressed.
+    """
+    n, dim = vectors.shape
+    qtype = _SQ_TYPES.get(settings.embedding_quantization)
+    if settings.faiss_index_type == "hnsw":
+        if qtype is None:
+            index = faiss.IndexHNSWFlat(dim, settings.hnsw_m, faiss.METRIC_INNER_PRODUCT)
+        else:
+            index = faiss.IndexHNSWSQ(dim, qtype, settings.hnsw_m, faiss.METRIC_INNER_PRODUCT)
+            index.train(vectors)
+        index.hnsw.efConstruction = settings.hnsw_ef_construction
+        index.hnsw.efSearch = settings.hnsw_ef_search
+        return index
+    if settings.faiss_index_type == "ivfpq":
+        nlist = max(1, int(np.sqrt(n)))
+        pq_m = next(m for m in (dim // 4, dim // 8, dim // 16, 1) if m and dim % m == 0)
+        if n < max(nlist, 1 << _PQ_NBITS) * _MIN_TRAIN_PER_CENTROID:
+            log.warning(
+                "Only %d vectors — too few to train IVFPQ (nlist=%d); using a flat index",
+                n, nlist,
+            )
+            return _flat_index(vectors)
+        quantizer = faiss.IndexFlatIP(dim)
+        index = faiss.IndexIVFPQ(quantizer, dim, nlist, pq_m, _PQ_NBITS, faiss.METRIC_INNER_PRODUCT)
+        index.train(vectors)
+        index.nprobe = settings.ivf_nprobe
+        return index
+    return _flat_index(vectors)
+
+
+def _flat_index(vectors: np.ndarray) -> faiss.Index:
+    """Exact-search index, scalar-quantized when EMBEDDING_QUANTIZATION asks for it."""
+    dim = vectors.shape[1]
+    qtype = _SQ_TYPES.get(settings.embedding_quantization)
+    if qtype is None:
+        return faiss.IndexFlatIP(dim)
+    index = faiss.IndexScalarQuantizer(dim, qtype, faiss.METRIC_INNER_PRODUCT)
+    index.train(vectors)
+    return index
+
+
+def _embed_texts(texts: list[str]) -> np.ndarray:
+    """Embed texts batch by batch, returning one (N, dim) float32 matrix."""
+    embeddings = get_embeddings()
+    batches = [texts[i:i + _EMBED_BATCH_SIZE] for i in range(0, len(texts), _EMBED_BATCH_SIZE)]
+    # Keep vectors as float32 arrays end-to-end so they reach faiss.add as one
+    # contiguous buffer instead of N·d boxed Python floats.
+    embed = getattr(embeddings, "embed_documents_array", None) or (
+        lambda batch: np.asarray(embeddings.embed_documents(batch), dtype=np.float32)
+    )
+    return np.vstack([embed(batch) for batch in batches])
+
+
+def build_vector_store(
+    chunks: list,
+    reused: tuple[list[str], list[dict], np.ndarray] | None = None,
+) -> FAISS:
+    """
+    Embed chunks and build the FAISS index.
+
+    `reused` carries (texts, metadatas, vectors) taken from a previous index for
+    unchanged files; those are added as-is without touching the embedding model.
+    """
     log.info("Embedding %d chunks — this may take a moment…", len(chunks))
     embeddings = get_embeddings()
-    vectorstore = FAISS.from_documents(chunks, embeddings)
-    log.info("FAISS index built — %d vectors", vectorstore.index.ntotal)
+
+    texts = [c.page_content for c in chunks]
+    metadatas = [c.metadata for c in chunks]
+    parts = [_embed_texts(texts)] if texts else []
+    if reused is not None and reused[0]:
+        texts += reused[0]
+        metadatas += reused[1]
+        parts.append(reused[2])
+    vectors = np.ascontiguousarray(np.vstack(parts), dtype=np.float32)
+    faiss.normalize_L2(vectors)   # unit length → inner product == cosine similarity
+
+    vectorstore = FAISS(
+        embedding_function=embeddings,
+        index=_new_index(vectors),
+        docstore=InMemoryDocstore(),
+        index_to_docstore_id={},
+        distance_strategy=DistanceStrategy.MAX_INNER_PRODUCT,
+    )
+    vectorstore.add_embeddings(list(zip(texts, vectors)), metadatas=metadatas)
+    log.info(
+        "FAISS %s index built — %d vectors",
+        settings.faiss_index_type, vectorstore.index.ntotal,
+    )
     return vectorstore
 
 
 def persist_vector_store(vectorstore: FAISS) -> None:
-    """Save the FAISS index to disk."""
+    """
+    Save vectors to index.faiss and chunks to docs.sqlite (no pickle).
+    Both are written to temp files and swapped in with os.replace, so a
+    reader never sees a half-written one. The running server's store is
+    closed for the swap — Windows refuses to replace files that are open —
+    and reloads from the new files on its next request.
+    """
     store_path = settings.store_path
     store_path.mkdir(parents=True, exist_ok=True)
-    vectorstore.save_local(str(store_path))
+
+    tmp_index = store_path / "index.faiss.tmp"
+    faiss.write_index(vectorstore.index, str(tmp_index))
+    tmp_docs = store_path / f"{DOCSTORE_FILE}.tmp"
+    SQLiteDocstore.write(tmp_docs, (
+        vectorstore.docstore.search(vectorstore.index_to_docstore_id[i])
+        for i in range(vectorstore.index.ntotal)
+    ))
+    with released_vector_store():
+        os.replace(tmp_index, store_path / "index.faiss")
+        os.replace(tmp_docs, store_path / DOCSTORE_FILE)
+        # Pickled docstore from FAISS.save_local in earlier versions — no longer read
+        (store_path / "index.pkl").unlink(missing_ok=True)
     log.info("Vector store persisted to '%s'", store_path)
 
 
+def _config_fingerprint() -> dict:
+    """
+    Settings that change chunk boundaries, the vectors, or how they are stored
+    and compared — any change forces a full re-embed instead of reusing rows.
+    """
+    return {
+        "embedding_model": settings.embedding_model,
+        "embedding_backend": settings.embedding_backend,
+        "chunk_size": settings.chunk_size,
+        "chunk_overlap": settings.chunk_overlap,
+        "faiss_index_type": settings.faiss_index_type,
+        "embedding_quantization": settings.embedding_quantization,
+        # Vectors are L2-normalised and searched by inner product (see build_vector_store)
+        "metric": "inner_product",
+    }
+
+
+def _read_manifest(store_path: Path) -> dict:
+    try:
+        return json.loads((store_path / _MANIFEST_FILE).read_text(encoding="utf-8"))
+    except (OSError, ValueError):
+        return {}
+
+
+def _write_manifest(store_path: Path, files: dict[str, str]) -> None:
+    """Write the manifest atomically (temp file + os.replace)."""
+    manifest = {"config": _config_fingerprint(), "files": files}
+    tmp = store_path / f"{_MANIFEST_FILE}.tmp"
+    tmp.write_text(json.dumps(manifest, indent=2), encoding="utf-8")
+    os.replace(tmp, store_path / _MANIFEST_FILE)
+
+
+def _reusable_vectors(store_path: Path, sources: set[str]) -> tuple[list[str], list[dict], np.ndarray] | None:
+    """Pull (texts, metadatas, vectors) for `sources` out of the previous index."""
+    if not vector_store_exists():
+        # Older pickled stores are re-embedded rather than unpickled
+        # (the embedding cache makes this cheap)
+        return None
+    try:
+        index = faiss.read_index(str(store_path / "index.faiss"))
+        docstore = SQLiteDocstore(store_path / DOCSTORE_FILE)
+    except Exception as exc:
+        log.warning("Could not load previous index for reuse — re-embedding everything: %s", exc)
+        return None
+
+    texts: list[str] = []
+    metadatas: list[dict] = []
+    rows: list[np.ndarray] = []
+    try:
+        if not isinstance(index, (faiss.IndexFlat, faiss.IndexHNSWFlat)):
+            # Quantized codes (SQ/PQ) can't be reconstructed exactly — re-embed
+            # instead (the embedding cache makes this cheap)
+            return None
+        for position, doc in docstore.iter_documents():
+            if doc.metadata.get("source") in sources:
+                texts.append(doc.page_content)
+                # Chunks indexed before filenames were stored at load time get one now
+                doc.metadata.setdefault("filename", _filename(doc.metadata["source"]))
+                metadatas.append(doc.metadata)
+                rows.append(index.reconstruct(position))
+    finally:
+        docstore.close()
+    if not rows:
+        return None
+    return texts, metadatas, np.vstack(rows)
+
+
 def ingest(force_rebuild: bool = True) -> tuple:
     """
     Full ingestion pipeline. Called by `python ingestor.py` or POST /api/ingest.
@@ -136,21 +448,41 @@ def ingest(force_rebuild: bool = True) -> tuple:
     log.info("=== Ingestion started (force_rebuild=%s) ===", force_rebuild)
 
     store_path = settings.store_path
-    if not force_rebuild and store_path.exists():
+    if not force_rebuild and vector_store_exists():
         log.info("Index already exists and force_rebuild=False — skipping.")
-        embeddings = get_embeddings()
-        vs = FAISS.load_local(
-            str(store_path), embeddings, allow_dangerous_deserialization=True
-        )
-        return vs, 0
+        return get_vector_store(), 0
 
     docs_path = settings.docs_path
     documents = load_documents(docs_path)
-    chunks = split_documents(documents)
-    vectorstore = build_vector_store(chunks)
+    hashes = {d.metadata["source"]: d.metadata.get("content_hash", "") for d in documents}
+
+    # ── Incremental: keep vectors for files whose content hash is unchanged ──
+    manifest = _read_manifest(store_path)
+    reused = None
+    if manifest.get("config") == _config_fingerprint() and vector_store_exists():
+        previous = manifest.get("files", {})
+        unchanged = {src for src, digest in hashes.items() if digest and previous.get(src) == digest}
+        if unchanged:
+            reused = _reusable_vectors(store_path, unchanged)
+    if reused is not None:
+        kept = {m["source"] for m in reused[1]}
+        documents_to_embed = [d for d in documents if d.metadata["source"] not in kept]
+        log.info(
+            "Reusing vectors for %d unchanged file(s); re-embedding %d document(s)",
+            len(kept), len(documents_to_embed),
+        )
+    else:
+        documents_to_embed = documents
+
+    chunks = split_documents(documents_to_embed) if documents_to_embed else []
+    vectorstore = build_vector_store(chunks, reused=reused)
     persist_vector_store(vectorstore)
+    _write_manifest(store_path, hashes)
 
-    log.info("=== Ingestion complete: %d docs → %d chunks ===", len(documents), len(chunks))
+    log.info(
+        "=== Ingestion complete: %d docs → %d chunks ===",
+        len(documents), vectorstore.index.ntotal,
+    )
     return vectorstore, len(documents)
 
 
@@ -22,13 +22,25 @@ Interactive docs:
     http://localhost:8000/redoc  (ReDoc)
 """
 
+import os
 from contextlib import asynccontextmanager
 
+from config import settings
+
+# BLAS/OpenMP read these once when torch is first imported (indirectly via
+# router → embeddings), so they must be set before the router import below.
+os.environ.setdefault("OMP_NUM_THREADS", str(settings.embedding_num_threads))
+os.environ.setdefault("MKL_NUM_THREADS", str(settings.embedding_num_threads))
+
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.middleware.gzip import GZipMiddleware
+from fastapi.responses import ORJSONResponse
+from starlette.types import Receive, Scope, Send
 
-from config import settings
+import rag_pipeline as rag
 from logger import get_logger
+from retriever import vector_store_exists, warm_vector_store
 from router import router
 
 log = get_logger(__name__)
@@ -37,9 +49,9 @@ log = get_logger(__name__)
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     """
-    Startup: log configuration summary and pre-warm the retrieval layer
-    so the first user request is fast.
-    Shutdown: no cleanup needed (FAISS is file-based, no connections to close).
+    Startup: log configuration summary and pre-warm the retrieval layer and
+    the Groq client so the first user request is fast.
+    Shutdown: stop the LLM micro-batcher (FAISS is file-based, nothing else to close).
     """
     log.info("═" * 55)
     log.info("  LangChain RAG Platform  —  starting up")
@@ -52,11 +64,10 @@ async def lifespan(app: FastAPI):
     log.info("  Vector store  : %s", settings.store_path)
     log.info("═" * 55)
 
-    # Pre-warm: attempt to load the vector store into cache on startup
-    if settings.store_path.exists():
+    # Pre-warm: map the vector store and fault its search path into memory
+    if vector_store_exists():
         try:
-            from retriever import get_vector_store
-            vs = get_vector_store()
+            vs = warm_vector_store()
             log.info("Vector store ready — %d embeddings pre-loaded", vs.index.ntotal)
         except Exception as exc:
             log.warning("Could not pre-load vector store: %s", exc)
@@ -67,8 +78,16 @@ async def lifespan(app: FastAPI):
             settings.store_path,
         )
 
+    try:
+        await rag.awarm_llm()
+    except Exception as exc:
+        log.warning("Could not warm up the LLM client: %s", exc)
+
+    await rag.llm_batcher.start()
+
     yield  # Application is live
 
+    await rag.llm_batcher.stop()
     log.info("LangChain RAG Platform — shutdown complete")
 
 
@@ -82,6 +101,8 @@ app = FastAPI(
     ),
     version="1.0.0",
     lifespan=lifespan,
+    # orjson for every JSON response, including routes that still use response_model
+    default_response_class=ORJSONResponse,
     docs_url="/docs",
     redoc_url="/redoc",
     openapi_tags=[
@@ -93,12 +114,30 @@ app = FastAPI(
 # ── CORS ───────────────────────────────────────────────────────────────────────
 app.add_middleware(
     CORSMiddleware,
-    allow_origins=settings.cors_origins_list,
+    allow_origins=settings.cors_origins_parsed,
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
 )
 
+# ── Compression ────────────────────────────────────────────────────────────────
+class _GZipExceptStream(GZipMiddleware):
+    """GZip for JSON bodies; the SSE stream passes through so tokens are not buffered."""
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] == "http" and scope["path"].endswith("/ask/stream"):
+            await self.app(scope, receive, send)
+            return
+        await super().__call__(scope, receive, send)
+
+
+if settings.gzip_level:
+    app.add_middleware(
+        _GZipExceptStream,
+        minimum_size=settings.gzip_min_size,
+        compresslevel=settings.gzip_level,
+    )
+
 # ── Routes ─────────────────────────────────────────────────────────────────────
 app.include_router(router, prefix="/api")
 
@@ -0,0 +1,124 @@
+"""
+onnx_embeddings.py
+──────────────────
+Optional ONNX Runtime backend for all-MiniLM-L6-v2 with int8 dynamic quantization.
+
+Why:
+  • The stock PyTorch checkpoint is FP32 (~86 MB); the int8 export is ~22 MB,
+    so each forward pass streams a quarter of the weight bytes.
+  • ONNX Runtime's CPU provider uses VNNI int8 GEMM kernels on modern x86,
+    typically giving 2–4× query-embedding throughput over PyTorch on CPU.
+
+Enable with EMBEDDING_BACKEND=onnx after exporting the model once:
+    pip install onnxruntime transformers "optimum[exporters]"
+    python onnx_embeddings.py
+
+The export writes <ONNX_MODEL_DIR>/model.onnx (FP32) and model_int8.onnx
+(quantized) plus the tokenizer files used at inference time.
+"""
+
+from pathlib import Path
+
+import numpy as np
+from langchain_core.embeddings import Embeddings
+
+from logger import get_logger
+
+log = get_logger(__name__)
+
+_QUANTIZED_FILE = "model_int8.onnx"
+
+
+class OnnxMiniLMEmbeddings(Embeddings):
+    """Sentence embeddings via ONNX Runtime: tokenize → run → mean-pool → L2-normalise."""
+
+    def __init__(self, model_dir: Path, *, batch_size: int = 32, num_threads: int = 1) -> None:
+        try:
+            import onnxruntime as ort
+            from transformers import AutoTokenizer
+        except ImportError as exc:
+            raise ValueError(
+                "EMBEDDING_BACKEND=onnx requires `onnxruntime` and `transformers`. "
+                "Install them or set EMBEDDING_BACKEND=huggingface."
+            ) from exc
+
+        model_file = model_dir / _QUANTIZED_FILE
+        if not model_file.exists():
+            raise FileNotFoundError(
+                f"Quantized ONNX model not found at '{model_file}'. "
+                "Run `python onnx_embeddings.py` to export it first."
+            )
+
+        sess_options = ort.SessionOptions()
+        # Same budget as the torch backend (settings.embedding_num_threads) —
+        # one thread per logical core oversubscribes hyperthreads
+        sess_options.intra_op_num_threads = num_threads
+        sess_options.inter_op_num_threads = 1
+        sess_options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+
+        self.batch_size = batch_size
+        # Fast (Rust) tokenizer saved alongside the exported model
+        self.tokenizer = AutoTokenizer.from_pretrained(str(model_dir), use_fast=True)
+        self.session = ort.InferenceSession(
+            str(model_file), sess_options, providers=["CPUExecutionProvider"]
+        )
+        self._input_names = {i.name for i in self.session.get_inputs()}
+        log.info("ONNX embeddings loaded from '%s'", model_file)
+
+    def _embed_batch(self, texts: list[str]) -> np.ndarray:
+        enc = self.tokenizer(
+            texts, padding=True, truncation=True, max_length=256, return_tensors="np"
+        )
+        feeds = {k: v.astype(np.int64) for k, v in enc.items() if k in self._input_names}
+        token_embeddings = self.session.run(None, feeds)[0]          # (batch, seq, dim)
+
+        mask = enc["attention_mask"][..., None].astype(np.float32)   # (batch, seq, 1)
+        pooled = (token_embeddings * mask).sum(axis=1) / np.clip(mask.sum(axis=1), 1e-9, None)
+        norms = np.sqrt(np.einsum("ij,ij->i", pooled, pooled))[:, None]
+        return pooled / np.clip(norms, 1e-12, None)
+
+    def embed_documents(self, texts: list[str]) -> list[list[float]]:
+        if not texts:
+            return []
+        batches = [
+            self._embed_batch(texts[i:i + self.batch_size])
+            for i in range(0, len(texts), self.batch_size)
+        ]
+        return np.vstack(batches).astype(np.float32).tolist()
+
+    def embed_query(self, text: str) -> list[float]:
+        return self._embed_batch([text])[0].astype(np.float32).tolist()
+
+
+def export_quantized_model(model_name: str, model_dir: Path) -> Path:
+    """Export `model_name` to ONNX and write a dynamically int8-quantized copy."""
+    from onnxruntime.quantization import QuantType, quantize_dynamic
+    from optimum.exporters.onnx import main_export
+
+    model_dir.mkdir(parents=True, exist_ok=True)
+    log.info("Exporting '%s' to ONNX in '%s'", model_name, model_dir)
+    main_export(model_name, output=model_dir, task="feature-extraction")
+
+    quantized = model_dir / _QUANTIZED_FILE
+    quantize_dynamic(
+        model_input=str(model_dir / "model.onnx"),
+        model_output=str(quantized),
+        weight_type=QuantType.QInt8,
+    )
+    log.info("Quantized model written to '%s'", quantized)
+    return quantized
+
+
+# ── CLI entry point ────────────────────────────────────────────────────────────
+if __name__ == "__main__":
+    import sys
+
+    from config import settings
+
+    try:
+        _path = export_quantized_model(settings.embedding_model, settings.onnx_model_path)
+        print(f"[OK] ONNX int8 model exported to {_path}")
+        sys.exit(0)
+    except Exception as _exc:
+        print(f"[ERROR] ONNX export failed: {_exc}", file=sys.stderr)
+        sys.exit(1)
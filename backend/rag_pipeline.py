@@ -12,22 +12,55 @@ Design decisions:
   • Deliberately NOT using LangChain's RetrievalQA chain here — we own
     the retrieval step in retriever.py (to expose scores) so we only need
     a simple LLM call with a hand-crafted prompt.
-  • Conversation history (follow-up support) is injected into the system
-    prompt when settings.enable_conversation_memory is True.
+  • Conversation history (follow-up support) is injected as prior messages
+    when settings.enable_conversation_memory is True, trimmed to the newest
+    turns that fit in settings.history_token_budget.
+  • The system prompt is a constant and the retrieved context gets its own
+    message ahead of the history, so the prompt prefix stays cache-friendly.
   • Temperature is read from settings so it can be tuned without code changes.
+  • Stand-alone questions (no conversation history) are first looked up in the
+    answer cache (exact text, then semantic) at the request's retrieval k;
+    hits skip retrieval and the LLM call entirely. Identical prompts (incl.
+    history) are also served from LangChain's SQLite LLM cache when
+    settings.enable_llm_cache is True.
 """
 
+import asyncio
+from collections.abc import AsyncIterator
+from functools import lru_cache
 from typing import Any
 
-from langchain_core.messages import HumanMessage, SystemMessage
+import httpx
+from langchain_community.cache import SQLiteCache
+from langchain_core.globals import set_llm_cache
+from langchain_core.messages import AIMessage, HumanMessage, SystemMessage
 from langchain_groq import ChatGroq
 
+from batcher import LLMBatcher
 from config import settings
+from embeddings import get_embeddings
 from logger import get_logger
-from retriever import RetrievedChunk, build_context, deduplicate_sources, retrieve
+from retriever import (
+    RetrievedChunk,
+    aretrieve,
+    build_context,
+    deduplicate_sources,
+    retrieve,
+    retrieve_many,
+)
+from schemas import ChatTurn
+from semantic_cache import get_semantic_cache
+from tokens import count_tokens
 
 log = get_logger(__name__)
 
+if settings.enable_llm_cache:
+    set_llm_cache(SQLiteCache(database_path=settings.llm_cache_path))
+
+# Caps concurrent Groq calls from aask() so bursts queue here instead of
+# tripping provider rate limits.
+_llm_semaphore = asyncio.Semaphore(settings.max_concurrent_llm_calls)
+
 # ── System prompt ─────────────────────────────────────────────────────────────
 _SYSTEM_PROMPT = """\
 You are a knowledgeable and precise AI assistant for a RAG-powered knowledge base.
@@ -41,37 +74,111 @@ Rules you MUST follow:
 """
 
 
+# One keep-alive pool per process, shared by every ChatGroq instance (including
+# ones rebuilt after invalidate_llm_cache()) so repeat calls skip the TCP+TLS
+# handshake. Explicit timeouts stop a provider blip from hanging a request.
+_HTTP_LIMITS = httpx.Limits(max_keepalive_connections=20, max_connections=100)
+_HTTP_TIMEOUT = httpx.Timeout(connect=3.0, read=settings.llm_timeout_seconds, write=10.0, pool=5.0)
+_http_client = httpx.Client(limits=_HTTP_LIMITS, timeout=_HTTP_TIMEOUT)
+_http_async_client = httpx.AsyncClient(limits=_HTTP_LIMITS, timeout=_HTTP_TIMEOUT)
+
+
+@lru_cache(maxsize=1)
 def _build_llm() -> ChatGroq:
-    """Instantiate the Groq LLM from current settings."""
+    """Instantiate the Groq LLM from current settings (built once per process)."""
     if not settings.groq_api_key:
         raise ValueError(
             "GROQ_API_KEY is not set. Add it to backend/.env and restart the server."
         )
+    log.info("Creating Groq client (%s)", settings.groq_model)
     return ChatGroq(
         model=settings.groq_model,
         groq_api_key=settings.groq_api_key,
         temperature=settings.llm_temperature,
+        timeout=_HTTP_TIMEOUT,
+        max_retries=settings.llm_max_retries,
+        http_client=_http_client,
+        http_async_client=_http_async_client,
     )
 
 
+async def awarm_llm() -> None:
+    """
+    Build the Groq client ahead of the first request and, when
+    settings.warmup_llm is on, send a 1-token ping so the TCP+TLS handshake
+    is paid at startup rather than by the first user.
+    """
+    llm = _build_llm()
+    if not settings.warmup_llm:
+        return
+    # Bypass the LLM response cache — a cached "ping" would never touch the network
+    ping = llm.model_copy(update={"cache": False, "max_tokens": 1})
+    await ping.ainvoke([HumanMessage(content="ping")])
+    log.info("Groq connection warmed up")
+
+
+def invalidate_llm_cache() -> None:
+    """Drop the cached Groq client so the next call rebuilds it (e.g. after key rotation)."""
+    _build_llm.cache_clear()
+    log.info("LLM client cache invalidated — will rebuild on next request")
+
+
+# Coalesces concurrent aask() generations into batched Groq calls when
+# settings.llm_batch_timeout_ms > 0 (off by default). Started/stopped by
+# main.py's lifespan; falls back to direct ainvoke() otherwise.
+llm_batcher = LLMBatcher(
+    _build_llm,
+    max_batch_size=settings.llm_max_batch_size,
+    timeout_ms=settings.llm_batch_timeout_ms,
+)
+
+
+def _trim_history(conversation_history: list[ChatTurn]) -> list[ChatTurn]:
+    """
+    Keep the most recent turns that fit in settings.history_token_budget.
+    Walks newest → oldest so one long early answer can't crowd out recent
+    context, and short turns aren't dropped just because of a fixed count.
+    """
+    kept: list[ChatTurn] = []
+    used = 0
+    for turn in reversed(conversation_history):
+        cost = count_tokens(turn.get("content", ""))
+        if used + cost > settings.history_token_budget:
+            break
+        kept.append(turn)
+        used += cost
+    if len(kept) < len(conversation_history):
+        log.debug(
+            "History trimmed to %d/%d turns (~%d tokens)",
+            len(kept), len(conversation_history), used,
+        )
+    return kept[::-1]
+
+
 def _build_messages(
     question: str,
     context: str,
-    conversation_history: list[dict[str, str]],
+    conversation_history: list[ChatTurn],
 ) -> list:
     """
     Construct the message list for the LLM call:
-      [SystemMessage]
+      [SystemMessage]                                   ← static, byte-identical
+      [HumanMessage (retrieved context)]
       [HumanMessage (prior turn 1), AIMessage (prior reply 1), …]  ← optional
-      [HumanMessage (current question with context)]
-    """
-    from langchain_core.messages import AIMessage
+      [HumanMessage (current question)]
 
-    messages: list = [SystemMessage(content=_SYSTEM_PROMPT)]
+    Ordering is stable-first so providers with prefix (KV) caching can reuse
+    the prefill of the system prompt — and of the context too, for follow-ups
+    that retrieve the same chunks. Keep _SYSTEM_PROMPT free of interpolation.
+    """
+    messages: list = [
+        SystemMessage(content=_SYSTEM_PROMPT),
+        HumanMessage(content=f"Use the following context to answer my questions.\n\nContext:\n{context}"),
+    ]
 
     # Inject prior turns for conversational memory
     if settings.enable_conversation_memory and conversation_history:
-        for turn in conversation_history[-6:]:   # keep last 3 Q&A pairs max
+        for turn in _trim_history(conversation_history):
             role = turn.get("role", "")
             content = turn.get("content", "")
             if role == "user":
@@ -79,35 +186,85 @@ def _build_messages(
             elif role == "assistant":
                 messages.append(AIMessage(content=content))
 
-    # Final user message includes retrieved context
-    user_content = (
-        f"Use the following context to answer the question.\n\n"
-        f"Context:\n{context}\n\n"
-        f"Question: {question}"
-    )
-    messages.append(HumanMessage(content=user_content))
+    messages.append(HumanMessage(content=f"Question: {question}"))
     return messages
 
 
+def _use_answer_cache(history: list[ChatTurn]) -> bool:
+    """Follow-ups depend on prior turns, so only stand-alone questions are cached."""
+    return settings.enable_semantic_cache and not (
+        settings.enable_conversation_memory and history
+    )
+
+
+def _cache_lookup(
+    question: str,
+    history: list[ChatTurn],
+    k: int,
+) -> tuple[dict[str, Any] | None, list[float] | None]:
+    """
+    Check the answer cache (exact text, then semantic) for answers built from
+    k retrieved chunks.
+
+    Returns:
+        (cached_result_or_None, query_vector_to_store_on_miss_or_None)
+    """
+    if not _use_answer_cache(history):
+        return None, None
+    cache = get_semantic_cache()
+    cached = cache.lookup_exact(question, k)
+    if cached is not None:
+        return cached, None
+    query_vector = get_embeddings().embed_query(question)
+    return cache.lookup(question, query_vector, k), query_vector
+
+
+def _finish(
+    question: str,
+    answer: str,
+    chunks: list[RetrievedChunk],
+    query_vector: list[float] | None,
+    k: int,
+) -> dict[str, Any]:
+    """Attach deduplicated sources, log, and populate the answer cache (under k)."""
+    sources = deduplicate_sources(chunks)
+
+    log.info(
+        "RAG complete | answer_chars=%d | sources=%d | chunks=%d",
+        len(answer), len(sources), len(chunks),
+    )
+
+    result = {
+        "answer": answer,
+        "sources": sources,
+        "chunks_retrieved": len(chunks),
+    }
+    if query_vector is not None:
+        get_semantic_cache().add(question, query_vector, result, k)
+    return result
+
+
 def ask(
     question: str,
-    conversation_history: list[dict[str, str]] | None = None,
+    conversation_history: list[ChatTurn] | None = None,
+    top_k: int | None = None,
 ) -> dict[str, Any]:
     """
     Full RAG pipeline entry point:
       1. Retrieve relevant chunks (with similarity scores).
       2. Build grounded context string.
-      3. Call Groq LLM with system + history + context-injected user message.
+      3. Call Groq LLM with system + context + history + question messages.
       4. Return answer + deduplicated source citations.
 
     Args:
         question: The user's natural-language question.
         conversation_history: Prior turns [{role, content}, …] for follow-up support.
+        top_k: Chunks to retrieve for this call (defaults to settings.retrieval_k).
 
     Returns:
         {
           "answer":  str,
-          "sources": [{"filename", "snippet", "similarity_score", "start_index"}, …],
+          "sources": [{"filename", "snippet", "similarity_score", "start_index"?}, …],
           "chunks_retrieved": int,
         }
     """
@@ -116,10 +273,17 @@ def ask(
         raise ValueError("Question must not be empty.")
 
     history = conversation_history or []
+    k = top_k or settings.retrieval_k
     log.info("RAG ask | question=%r | history_turns=%d", question[:80], len(history))
 
+    # ── 0. Semantic cache ────────────────────────────────────────────────────
+    cached, query_vector = _cache_lookup(question, history, k)
+    if cached is not None:
+        return cached
+
     # ── 1. Retrieve ──────────────────────────────────────────────────────────
-    chunks: list[RetrievedChunk] = retrieve(question)
+    # Reuse the cache-lookup embedding so the question is embedded only once
+    chunks: list[RetrievedChunk] = retrieve(question, k=k, embedding=query_vector)
     context: str = build_context(chunks)
 
     # ── 2. Generate ──────────────────────────────────────────────────────────
@@ -133,15 +297,138 @@ def ask(
     answer: str = response.content.strip()
 
     # ── 3. Format sources ────────────────────────────────────────────────────
-    sources = deduplicate_sources(chunks)
+    return _finish(question, answer, chunks, query_vector, k)
 
-    log.info(
-        "RAG complete | answer_chars=%d | sources=%d | chunks=%d",
-        len(answer), len(sources), len(chunks),
-    )
 
-    return {
-        "answer": answer,
-        "sources": sources,
-        "chunks_retrieved": len(chunks),
-    }
+async def aask(
+    question: str,
+    conversation_history: list[ChatTurn] | None = None,
+    top_k: int | None = None,
+) -> dict[str, Any]:
+    """
+    Async twin of ask() used by POST /ask. Retrieval runs in a worker thread
+    and generation uses llm.ainvoke(), so concurrent requests overlap their
+    network latency instead of blocking the event loop. `top_k` overrides
+    settings.retrieval_k for this call only.
+    """
+    question = question.strip()
+    if not question:
+        raise ValueError("Question must not be empty.")
+
+    history = conversation_history or []
+    k = top_k or settings.retrieval_k
+    log.info("RAG aask | question=%r | history_turns=%d", question[:80], len(history))
+
+    cached, query_vector = await asyncio.to_thread(_cache_lookup, question, history, k)
+    if cached is not None:
+        return cached
+
+    retrieval = aretrieve(question, k=k, embedding=query_vector)
+    if _build_llm.cache_info().currsize:
+        chunks: list[RetrievedChunk] = await retrieval
+    else:
+        # Cold client: build it (and its HTTP pools) while retrieval runs
+        chunks, _ = await asyncio.gather(retrieval, asyncio.to_thread(_build_llm))
+    messages = _build_messages(question, build_context(chunks), history)
+    answer = await _agenerate(messages)
+
+    return _finish(question, answer, chunks, query_vector, k)
+
+
+async def _agenerate(messages: list) -> str:
+    """One Groq generation through the semaphore + micro-batcher."""
+    async with _llm_semaphore:
+        response = await llm_batcher.submit(messages)
+    return response.content.strip()
+
+
+async def aask_batch(
+    questions: list[str],
+    conversation_histories: list[list[ChatTurn]],
+    top_ks: list[int | None],
+) -> list[dict[str, Any]]:
+    """
+    Answer several independent questions in one call (POST /ask/batch).
+
+    Cache misses are embedded in one batch call and searched in FAISS as a
+    single (N, d) query; their LLM calls are submitted together and run
+    concurrently (through the micro-batcher, when it is enabled).
+    Results come back in input order, in the same shape as aask().
+    """
+    questions = [q.strip() for q in questions]
+    if not all(questions):
+        raise ValueError("Question must not be empty.")
+    log.info("RAG aask_batch | questions=%d", len(questions))
+
+    ks = [top_k or settings.retrieval_k for top_k in top_ks]
+    cache = get_semantic_cache()
+    cacheable = [_use_answer_cache(h) for h in conversation_histories]
+    results: list[dict[str, Any] | None] = [
+        cache.lookup_exact(q, k) if use else None for q, k, use in zip(questions, ks, cacheable)
+    ]
+
+    misses = [i for i, r in enumerate(results) if r is None]
+    if misses:
+        vectors = await asyncio.to_thread(
+            get_embeddings().embed_documents, [questions[i] for i in misses]
+        )
+        query_vectors = dict(zip(misses, vectors))
+        for i in misses:
+            if cacheable[i]:
+                results[i] = cache.lookup(questions[i], query_vectors[i], ks[i])
+
+    todo = [i for i in misses if results[i] is None]
+    if todo:
+        chunk_lists = await asyncio.to_thread(
+            retrieve_many,
+            [questions[i] for i in todo],
+            [ks[i] for i in todo],
+            [query_vectors[i] for i in todo],
+        )
+        answers = await asyncio.gather(*(
+            _agenerate(_build_messages(questions[i], build_context(chunks), conversation_histories[i]))
+            for i, chunks in zip(todo, chunk_lists)
+        ))
+        for i, chunks, answer in zip(todo, chunk_lists, answers):
+            results[i] = _finish(
+                questions[i], answer, chunks, query_vectors[i] if cacheable[i] else None, ks[i]
+            )
+
+    return results  # type: ignore[return-value]  # every slot is filled by now
+
+
+# ── Streaming ─────────────────────────────────────────────────────────────────
+
+def prepare_stream(
+    question: str,
+    conversation_history: list[ChatTurn] | None = None,
+    top_k: int | None = None,
+) -> tuple[list, list[dict], int]:
+    """
+    Run the synchronous half of the pipeline for POST /ask/stream:
+    retrieval, context building and prompt assembly.
+
+    Kept separate from astream_answer() so retrieval errors (missing index,
+    empty question) surface before the HTTP response starts streaming.
+
+    Returns:
+        (messages, sources, chunks_retrieved)
+    """
+    question = question.strip()
+    if not question:
+        raise ValueError("Question must not be empty.")
+
+    history = conversation_history or []
+    log.info("RAG stream | question=%r | history_turns=%d", question[:80], len(history))
+
+    chunks: list[RetrievedChunk] = retrieve(question, k=top_k)
+    messages = _build_messages(question, build_context(chunks), history)
+    return messages, deduplicate_sources(chunks), len(chunks)
+
+
+async def astream_answer(messages: list) -> AsyncIterator[str]:
+    """Yield answer text fragments from Groq as they are generated."""
+    llm = _build_llm()
+    async for chunk in llm.astream(messages):
+        if chunk.content:
+            yield chunk.content
@@ -4,30 +4,51 @@ retriever.py
 Retrieval orchestration layer — sits between the vector store and the LLM chain.
 
 Responsibilities:
-  • Load the persisted FAISS index.
-  • Perform similarity_search_with_score so callers get relevance scores.
-  • Apply the configurable score threshold to filter low-relevance chunks.
+  • Load the persisted FAISS index (memory-mapped read-only where supported)
+    and open its SQLite docstore; chunks are read only for actual hits.
+  • Search by (normalised) query vector; inner-product scores are cosine similarities.
+  • Apply the configurable score threshold to filter low-relevance chunks
+    (in FAISS itself via range_search when RETRIEVAL_MODE=threshold).
+  • Stop collecting chunks once settings.max_context_tokens is reached, so the
+    prompt (and Groq prefill latency/cost) stays bounded regardless of k.
   • Deduplicate sources so we never cite the same file twice.
-  • Return both the context string (for the prompt) and structured SourceDocument
-    metadata (for the API response).
+  • Return both the context string (for the prompt) and plain SourceDict
+    metadata (for the API response) — typed dicts that orjson encodes
+    directly, with no model construction per request.
 
 This module deliberately does NOT call the LLM — that is rag_pipeline.py's job.
 Keeping retrieval separate makes it trivially testable and swappable (e.g. Chroma,
 Pinecone, hybrid BM25+dense) without touching chain logic.
 """
 
+import asyncio
+import logging
+import threading
+from collections.abc import Iterator
+from contextlib import contextmanager
 from dataclasses import dataclass
 from functools import lru_cache
-from typing import Any
+from pathlib import Path, PurePosixPath
 
+import faiss
+import numpy as np
 from langchain_community.vectorstores import FAISS
+from langchain_community.vectorstores.utils import DistanceStrategy
+from langchain_core.documents import Document
 
 from config import settings
 from embeddings import get_embeddings
 from logger import get_logger
+from schemas import SourceDict
+from sqlite_docstore import DOCSTORE_FILE, PositionIds, SQLiteDocstore
+from tokens import count_tokens
 
 log = get_logger(__name__)
 
+# Held while the store is loaded and while ingestion swaps its files, so a
+# request can't reopen the old files halfway through a swap
+_store_lock = threading.Lock()
+
 
 @dataclass
 class RetrievedChunk:
@@ -39,69 +60,237 @@ class RetrievedChunk:
     start_index: int | None
 
 
+def _read_index(path: Path) -> faiss.Index:
+    """
+    Memory-map the index read-only so startup does no bulk I/O and forked
+    workers share the file-backed pages. Index types FAISS can't mmap fall
+    back to a regular heap read.
+    """
+    try:
+        return faiss.read_index(str(path), faiss.IO_FLAG_MMAP | faiss.IO_FLAG_READ_ONLY)
+    except RuntimeError as exc:
+        log.debug("mmap read of FAISS index not supported — loading into memory: %s", exc)
+        return faiss.read_index(str(path))
+
+
+def vector_store_exists() -> bool:
+    """True when both halves of the persisted store (vectors + chunks) are on disk."""
+    store_path = settings.store_path
+    return (store_path / "index.faiss").exists() and (store_path / DOCSTORE_FILE).exists()
+
+
 @lru_cache(maxsize=1)
 def _load_vector_store() -> FAISS:
     """Load and cache the FAISS index from disk (loads only once per process)."""
     store_path = settings.store_path
-    if not store_path.exists():
+    if not vector_store_exists():
         raise FileNotFoundError(
             f"Vector store not found at '{store_path}'. "
             "Run `python ingestor.py` to build the index first."
         )
     log.info("Loading FAISS index from '%s'", store_path)
-    vs = FAISS.load_local(
-        str(store_path),
-        get_embeddings(),
-        allow_dangerous_deserialization=True,
+    index = _read_index(store_path / "index.faiss")
+    vs = FAISS(
+        embedding_function=get_embeddings(),
+        index=index,
+        docstore=SQLiteDocstore(store_path / DOCSTORE_FILE),
+        index_to_docstore_id=PositionIds(index.ntotal),
+        # Every store with a docs.sqlite was built on normalised vectors with an
+        # inner-product index (ingestor.build_vector_store) — score == cosine
+        distance_strategy=DistanceStrategy.MAX_INNER_PRODUCT,
+    )
+    _configure_search(vs.index)
+    log.info(
+        "FAISS index loaded — %s, %d vectors total",
+        type(vs.index).__name__, vs.index.ntotal,
     )
-    log.info("FAISS index loaded — %d vectors total", vs.index.ntotal)
     return vs
 
 
+def warm_vector_store() -> FAISS:
+    """
+    Load the store and run one throwaway search so the pages on the search
+    path (HNSW graph, quantizer) are resident before real traffic arrives.
+    """
+    vs = get_vector_store()
+    if vs.index.ntotal:
+        vs.index.search(np.zeros((1, vs.index.d), dtype=np.float32), 1)
+    return vs
+
+
+def _configure_search(index: faiss.Index) -> None:
+    """Apply query-time recall/speed knobs for approximate index types."""
+    if isinstance(index, faiss.IndexHNSW):
+        # efSearch must comfortably exceed k for good recall@k (request top_k is capped at 20)
+        index.hnsw.efSearch = max(settings.hnsw_ef_search, settings.retrieval_k * 4)
+    elif isinstance(index, faiss.IndexIVF):
+        index.nprobe = settings.ivf_nprobe
+    else:
+        log.info("Flat FAISS index in use — exact O(N) search per query")
+
+
 def get_vector_store() -> FAISS:
     """Public accessor for the cached vector store."""
-    return _load_vector_store()
+    with _store_lock:
+        return _load_vector_store()
 
 
-def invalidate_vector_store_cache() -> None:
-    """Clear the lru_cache after a re-ingestion so the new index is loaded."""
+def _drop_cached_store() -> None:
+    """Close the cached store's docstore connection and forget the store. Caller holds _store_lock."""
+    if _load_vector_store.cache_info().currsize:
+        _load_vector_store().docstore.close()
     _load_vector_store.cache_clear()
+
+
+def invalidate_vector_store_cache() -> None:
+    """Close and clear the cached store after a re-ingestion so the new index is loaded."""
+    with _store_lock:
+        _drop_cached_store()
     log.info("Vector store cache invalidated — will reload on next request")
 
 
-def retrieve(query: str) -> list[RetrievedChunk]:
+@contextmanager
+def released_vector_store() -> Iterator[None]:
+    """
+    Close and drop the cached store, and keep it unloaded, for the duration of
+    the block. Ingestion replaces index.faiss / docs.sqlite inside it: open
+    handles would leak, and on Windows make os.replace fail outright.
+    """
+    with _store_lock:
+        _drop_cached_store()
+        yield
+
+
+def _search(vs: FAISS, query_vec: np.ndarray, k: int) -> list[tuple[Document, float]]:
+    """
+    Run the FAISS search for one normalised query row and fetch the hits'
+    chunks from the docstore in a single query.
+
+    In "threshold" mode the score cut-off is pushed into FAISS via
+    range_search, so only qualifying vectors are returned and turned into
+    Documents. Index types without range_search fall back to top-k.
+    """
+    ids = None
+    threshold = settings.retrieval_score_threshold
+    if settings.retrieval_mode == "threshold" and threshold > 0:
+        try:
+            _, range_scores, range_ids = vs.index.range_search(query_vec, threshold)
+        except RuntimeError as exc:
+            log.debug("range_search unsupported by %s — using top-k: %s", type(vs.index).__name__, exc)
+        else:
+            order = np.argsort(-range_scores)[:k]
+            scores, ids = range_scores[order], range_ids[order]
+    if ids is None:
+        top_scores, top_ids = vs.index.search(query_vec, k)
+        scores, ids = top_scores[0], top_ids[0]
+
+    # FAISS pads with -1 when fewer than k vectors exist
+    hits = [(int(i), float(score)) for i, score in zip(ids, scores) if i >= 0]
+    docs = vs.docstore.fetch([i for i, _ in hits])
+    return [(docs[i], score) for i, score in hits if i in docs]
+
+
+def retrieve(
+    query: str,
+    k: int | None = None,
+    embedding: list[float] | None = None,
+) -> list[RetrievedChunk]:
     """
     Embed the query, search FAISS, apply threshold filtering, and return
     a list of RetrievedChunk objects ordered by similarity (highest first).
 
     Args:
         query: The natural-language question from the user.
+        k: Number of chunks to fetch (defaults to settings.retrieval_k).
+        embedding: Pre-computed query vector (e.g. from the semantic cache
+            lookup) — skips a second embedding pass when supplied.
 
     Returns:
         List of RetrievedChunk, filtered by settings.retrieval_score_threshold.
     """
     vs = get_vector_store()
-    raw: list[tuple[Any, float]] = vs.similarity_search_with_score(
-        query, k=settings.retrieval_k
-    )
+    if embedding is None:
+        embedding = get_embeddings().embed_query(query)
+    query_vec = _normalised_rows([embedding])
+    raw = _search(vs, query_vec, k or settings.retrieval_k)
+    return _collect(query, raw)
+
+
+def retrieve_many(
+    queries: list[str],
+    ks: list[int | None],
+    embeddings: list[list[float]],
+) -> list[list[RetrievedChunk]]:
+    """
+    Batched retrieve() for POST /ask/batch: the N query vectors go through
+    FAISS as one (N, d) search and all hits are read from the docstore in a
+    single query. Per-query k, threshold and token budget match retrieve().
+    """
+    vs = get_vector_store()
+    query_mat = _normalised_rows(embeddings)
+    ks_resolved = [k or settings.retrieval_k for k in ks]
+
+    if settings.retrieval_mode == "threshold" and settings.retrieval_score_threshold > 0:
+        # range_search results are ragged per query — search them one by one
+        raws = [
+            _search(vs, query_mat[i:i + 1], k)
+            for i, k in enumerate(ks_resolved)
+        ]
+    else:
+        scores, ids = vs.index.search(query_mat, max(ks_resolved))
+        hits = [
+            [(int(i), float(score)) for i, score in zip(ids[row, :k], scores[row, :k]) if i >= 0]
+            for row, k in enumerate(ks_resolved)
+        ]
+        docs = vs.docstore.fetch(sorted({i for row in hits for i, _ in row}))
+        raws = [[(docs[i], score) for i, score in row if i in docs] for row in hits]
+
+    return [_collect(query, raw) for query, raw in zip(queries, raws)]
+
+
+def _normalised_rows(vectors: list[list[float]]) -> np.ndarray:
+    """Stack query vectors into a float32 (N, d) matrix with unit-length rows."""
+    mat = np.array(vectors, dtype=np.float32).reshape(len(vectors), -1)
+    faiss.normalize_L2(mat)
+    return mat
+
+
+def _collect(query: str, raw: list[tuple[Document, float]]) -> list[RetrievedChunk]:
+    """Turn raw (Document, score) hits into RetrievedChunks within threshold and token budget."""
+    # Checked once per call so filtered-out debug lines cost no formatting work
+    debug = log.isEnabledFor(logging.DEBUG)
 
     chunks: list[RetrievedChunk] = []
+    context_tokens = 0
     for doc, raw_score in raw:
-        # FAISS returns L2 distance (lower = better); convert to [0,1] similarity
-        # using a simple inversion so 0 distance → 1.0 similarity.
-        similarity = float(max(0.0, 1.0 - raw_score / 2.0))
+        # Inner product of unit vectors == cosine; clamp float noise into [0, 1]
+        similarity = min(1.0, max(0.0, float(raw_score)))
 
         if similarity < settings.retrieval_score_threshold:
-            log.debug(
-                "Filtered chunk (score %.3f < threshold %.3f): %s",
-                similarity, settings.retrieval_score_threshold,
-                doc.metadata.get("source", "?")[:60],
-            )
+            if debug:
+                log.debug(
+                    "Filtered chunk | score=%.3f | threshold=%.3f | source=%s",
+                    similarity, settings.retrieval_score_threshold,
+                    doc.metadata.get("source", "?")[:60],
+                )
             continue
 
+        # Results arrive best-first, so once the budget is spent every remaining
+        # chunk is both lower-scoring and unaffordable. Always keep the top hit.
+        chunk_tokens = count_tokens(doc.page_content)
+        if chunks and context_tokens + chunk_tokens > settings.max_context_tokens:
+            if debug:
+                log.debug(
+                    "Context budget reached | used=%d | next=%d | budget=%d — dropping remaining chunks",
+                    context_tokens, chunk_tokens, settings.max_context_tokens,
+                )
+            break
+        context_tokens += chunk_tokens
+
         meta = doc.metadata or {}
         source_path: str = meta.get("source", "unknown")
-        filename = source_path.replace("\\", "/").split("/")[-1]
+        # Set at ingest time; derive it for indexes built before that
+        filename: str = meta.get("filename") or PurePosixPath(source_path.replace("\\", "/")).name
 
         chunks.append(RetrievedChunk(
             content=doc.page_content,
@@ -112,14 +301,27 @@ def retrieve(query: str) -> list[RetrievedChunk]:
         ))
 
     log.info(
-        "Retrieved %d/%d chunks for query %r (threshold=%.2f)",
+        "Retrieve | kept=%d | total=%d | threshold=%.2f | context_tokens=%d | query=%r",
         len(chunks), len(raw),
-        query[:60],
         settings.retrieval_score_threshold,
+        context_tokens,
+        query[:60],
     )
     return chunks
 
 
+async def aretrieve(
+    query: str,
+    k: int | None = None,
+    embedding: list[float] | None = None,
+) -> list[RetrievedChunk]:
+    """
+    Async variant of retrieve(). Embedding + FAISS search run in a worker
+    thread (both release the GIL in native code) so the event loop stays free.
+    """
+    return await asyncio.to_thread(retrieve, query, k, embedding)
+
+
 def build_context(chunks: list[RetrievedChunk]) -> str:
     """
     Concatenate chunk contents into a single context block for the prompt.
@@ -134,22 +336,26 @@ def build_context(chunks: list[RetrievedChunk]) -> str:
     return "\n\n---\n\n".join(parts)
 
 
-def deduplicate_sources(chunks: list[RetrievedChunk]) -> list[dict]:
+def deduplicate_sources(chunks: list[RetrievedChunk]) -> list[SourceDict]:
     """
     Collapse multiple chunks from the same file into one source citation.
     Returns the highest-scoring chunk per file for the citation.
     """
-    seen: dict[str, RetrievedChunk] = {}
+    best: dict[str, RetrievedChunk] = {}
     for chunk in chunks:
-        if chunk.filename not in seen or chunk.similarity_score > seen[chunk.filename].similarity_score:
-            seen[chunk.filename] = chunk
+        current = best.get(chunk.filename)
+        if current is None or chunk.similarity_score > current.similarity_score:
+            best[chunk.filename] = chunk
 
-    return [
-        {
+    sources: list[SourceDict] = []
+    for c in best.values():
+        source: SourceDict = {
             "filename": c.filename,
             "snippet": c.content[:350].strip() + ("…" if len(c.content) > 350 else ""),
             "similarity_score": c.similarity_score,
-            "start_index": c.start_index,
         }
-        for c in seen.values()
-    ]
+        # Omitted rather than null — the response and history log carry no dead keys
+        if c.start_index is not None:
+            source["start_index"] = c.start_index
+        sources.append(source)
+    return sources
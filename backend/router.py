@@ -7,30 +7,102 @@ Each endpoint is intentionally thin:
   • Parse + validate the request (Pydantic does this automatically).
   • Delegate to the appropriate domain module (rag_pipeline, history, ingestor).
   • Map domain exceptions to appropriate HTTP status codes.
-  • Return the response model (FastAPI serialises it to JSON).
+  • Run blocking work (embedding, FAISS, file I/O) via asyncio.to_thread so
+    the event loop keeps serving other requests meanwhile.
+  • Return the response model (FastAPI serialises it to JSON). Models built
+    from backend-controlled data use model_construct() — only the request body
+    (untrusted input) goes through validation. Hot endpoints
+    return ORJSONResponse directly — the payload is already plain dicts, so
+    skipping response-model validation + jsonable_encoder saves the dominant
+    per-request CPU cost; the model is still declared for the OpenAPI docs.
 
 No business logic lives here.
 """
 
-from fastapi import APIRouter, HTTPException, Query, status
+import asyncio
+import time
+from collections.abc import Callable, Coroutine, Iterator
+from typing import Any
+
+import orjson
+from fastapi import APIRouter, HTTPException, Query, Request, Response, status
+from fastapi.responses import ORJSONResponse, StreamingResponse
+from fastapi.routing import APIRoute
+from pydantic import BaseModel, ValidationError
 
 import history as hist
 import rag_pipeline as rag
 from config import settings
+from ingestor import ingest
 from logger import get_logger
+from retriever import get_vector_store, invalidate_vector_store_cache, vector_store_exists
 from schemas import (
+    BatchQuestionRequest,
+    BatchQuestionResponse,
     ClearHistoryResponse,
     DeleteHistoryResponse,
     HealthResponse,
     HistoryResponse,
     IngestResponse,
+    MetricsResponse,
     QuestionRequest,
     QuestionResponse,
-    SourceDocument,
 )
+from semantic_cache import get_semantic_cache, invalidate_semantic_cache
 
 log = get_logger(__name__)
-router = APIRouter()
+
+
+class _ModelJSONRequest(Request):
+    """Request whose JSON body is parsed and validated by pydantic-core in one pass."""
+
+    def __init__(self, scope: Any, receive: Any, model: type[BaseModel]) -> None:
+        super().__init__(scope, receive)
+        self._model = model
+
+    async def json(self) -> Any:
+        if not hasattr(self, "_json"):
+            body = await self.body()
+            try:
+                self._json = self._model.model_validate_json(body)
+            except ValidationError:
+                # Hand FastAPI the plain JSON so its 422 response keeps the usual shape
+                self._json = orjson.loads(body)
+        return self._json
+
+
+class _ValidatedJSONRoute(APIRoute):
+    """
+    For routes taking a single pydantic model body, validate the raw bytes with
+    model_validate_json instead of json.loads → dict → model_validate. FastAPI
+    then receives a ready model instance, which its own check passes through.
+    """
+
+    def get_route_handler(self) -> Callable[[Request], Coroutine[Any, Any, Response]]:
+        handler = super().get_route_handler()
+        params = self.dependant.body_params
+        if len(params) != 1 or getattr(params[0].field_info, "embed", False):
+            return handler
+        model = params[0].field_info.annotation
+        if not (isinstance(model, type) and issubclass(model, BaseModel)):
+            return handler
+
+        async def route_handler(request: Request) -> Response:
+            return await handler(_ModelJSONRequest(request.scope, request.receive, model))
+
+        return route_handler
+
+
+router = APIRouter(route_class=_ValidatedJSONRoute)
+
+
+def _model_response(model: BaseModel) -> Response:
+    """
+    Serialise with the model's own schema (compiled once when the class was
+    defined) straight to JSON bytes, skipping FastAPI's response-model
+    re-validation and jsonable_encoder pass.
+    """
+    return Response(model.model_dump_json(), media_type="application/json")
 
 
 # ══════════════════════════════════════════════════════════════════════════════
@@ -39,7 +111,8 @@ router = APIRouter()
 
 @router.post(
     "/ask",
-    response_model=QuestionResponse,
+    response_model=None,
+    responses={200: {"model": QuestionResponse}},
     summary="Ask a question",
     description=(
         "Submit a natural-language question. The RAG pipeline retrieves the most "
@@ -48,20 +121,17 @@ router = APIRouter()
     ),
     tags=["RAG"],
 )
-async def ask_question(body: QuestionRequest) -> QuestionResponse:
-    question = body.question.strip()
+async def ask_question(body: QuestionRequest) -> ORJSONResponse:
+    question = body.question
     log.info("POST /ask | question=%r | history_turns=%d", question[:80], len(body.conversation_history))
 
-    # Allow per-request top_k override
-    if body.top_k is not None:
-        original_k = settings.retrieval_k
-        settings.retrieval_k = body.top_k
-        log.debug("top_k override: %d → %d", original_k, body.top_k)
-
     try:
-        result = rag.ask(
+        # top_k is passed per call — mutating shared settings would leak the
+        # override into other requests interleaved on the event loop.
+        result = await rag.aask(
             question=question,
             conversation_history=body.conversation_history or [],
+            top_k=body.top_k,
         )
     except FileNotFoundError as exc:
         log.error("Vector store missing — user must run ingestor: %s", exc)
@@ -82,10 +152,6 @@ async def ask_question(body: QuestionRequest) -> QuestionResponse:
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail=f"Answer generation failed: {exc}",
         ) from exc
-    finally:
-        # Restore top_k if it was overridden
-        if body.top_k is not None:
-            settings.retrieval_k = original_k  # type: ignore[possibly-undefined]
 
     answer: str = result["answer"]
     raw_sources: list[dict] = result["sources"]
@@ -98,11 +164,145 @@ async def ask_question(body: QuestionRequest) -> QuestionResponse:
         chunks_retrieved=chunks_retrieved,
     )
 
-    return QuestionResponse(
-        question=question,
-        answer=answer,
-        sources=[SourceDocument(**s) for s in raw_sources],
-        chunks_retrieved=chunks_retrieved,
+    return ORJSONResponse({
+        "question": question,
+        "answer": answer,
+        "sources": raw_sources,
+        "chunks_retrieved": chunks_retrieved,
+    })
+
+
+# ══════════════════════════════════════════════════════════════════════════════
+# POST /ask/batch
+# ══════════════════════════════════════════════════════════════════════════════
+
+@router.post(
+    "/ask/batch",
+    response_model=None,
+    responses={200: {"model": BatchQuestionResponse}},
+    summary="Ask several questions at once",
+    description=(
+        "Answer up to 20 independent questions in one request. Questions are embedded "
+        "and searched together and their LLM calls are dispatched concurrently — "
+        "cheaper than the same number of POST /ask round-trips for evaluation runs "
+        "or dashboards. Results are returned in input order."
+    ),
+    tags=["RAG"],
+)
+async def ask_question_batch(body: BatchQuestionRequest) -> ORJSONResponse:
+    questions = [item.question for item in body.questions]
+    log.info("POST /ask/batch | questions=%d", len(questions))
+
+    try:
+        results = await rag.aask_batch(
+            questions,
+            [item.conversation_history or [] for item in body.questions],
+            [item.top_k for item in body.questions],
+        )
+    except FileNotFoundError as exc:
+        log.error("Vector store missing — user must run ingestor: %s", exc)
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail=(
+                "Knowledge base index not found. "
+                "Call POST /api/ingest first or run `python ingestor.py` manually."
+            ),
+        ) from exc
+    except ValueError as exc:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(exc)) from exc
+    except Exception as exc:
+        log.exception("Unhandled error in batch RAG pipeline: %s", exc)
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Answer generation failed: {exc}",
+        ) from exc
+
+    for question, result in zip(questions, results):
+        hist.log_entry(
+            question,
+            answer=result["answer"],
+            sources=result["sources"],
+            chunks_retrieved=result["chunks_retrieved"],
+        )
+
+    return ORJSONResponse({
+        "results": [{"question": question, **result} for question, result in zip(questions, results)],
+    })
+
+
+# ══════════════════════════════════════════════════════════════════════════════
+# POST /ask/stream
+# ══════════════════════════════════════════════════════════════════════════════
+
+def _sse(payload: dict | str) -> str:
+    """Format one Server-Sent Events `data:` frame."""
+    data = payload if isinstance(payload, str) else orjson.dumps(payload).decode("utf-8")
+    return f"data: {data}\n\n"
+
+
+@router.post(
+    "/ask/stream",
+    summary="Ask a question (streamed)",
+    description=(
+        "Same pipeline as POST /ask, but the answer is streamed as Server-Sent Events. "
+        "Frames: one `{\"sources\": [...], \"chunks_retrieved\": n}` frame, then "
+        "`{\"text\": \"...\"}` frames as tokens arrive, then `[DONE]`. "
+        "A `{\"error\": \"...\"}` frame is sent if generation fails mid-stream."
+    ),
+    response_class=StreamingResponse,
+    tags=["RAG"],
+)
+async def ask_question_stream(body: QuestionRequest) -> StreamingResponse:
+    question = body.question
+    log.info("POST /ask/stream | question=%r | history_turns=%d", question[:80], len(body.conversation_history))
+
+    try:
+        messages, sources, chunks_retrieved = await asyncio.to_thread(
+            rag.prepare_stream,
+            question=question,
+            conversation_history=body.conversation_history or [],
+            top_k=body.top_k,
+        )
+    except FileNotFoundError as exc:
+        log.error("Vector store missing — user must run ingestor: %s", exc)
+        hist.log_entry(question, error=str(exc))
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail=(
+                "Knowledge base index not found. "
+                "Call POST /api/ingest first or run `python ingestor.py` manually."
+            ),
+        ) from exc
+    except ValueError as exc:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(exc)) from exc
+
+    async def event_stream():
+        parts: list[str] = []
+        error: str | None = None
+        try:
+            yield _sse({"sources": sources, "chunks_retrieved": chunks_retrieved})
+            async for text in rag.astream_answer(messages):
+                parts.append(text)
+                yield _sse({"text": text})
+            yield _sse("[DONE]")
+        except Exception as exc:
+            log.exception("Streaming answer generation failed: %s", exc)
+            error = str(exc)
+            yield _sse({"error": f"Answer generation failed: {exc}"})
+        finally:
+            # Persist only once the stream has finished (or failed)
+            hist.log_entry(
+                question,
+                answer="".join(parts).strip(),
+                sources=sources,
+                chunks_retrieved=chunks_retrieved,
+                error=error,
+            )
+
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "Connection": "keep-alive"},
     )
 
 
@@ -110,34 +310,79 @@ async def ask_question(body: QuestionRequest) -> QuestionResponse:
 # GET /health
 # ══════════════════════════════════════════════════════════════════════════════
 
+# Load balancers poll /health every second or so; reuse one snapshot per TTL
+_HEALTH_TTL_SECONDS = 1.0
+_health_cache: tuple[float, dict[str, Any]] | None = None
+
+
+def _health_snapshot() -> dict[str, Any]:
+    """Build the /health payload, recomputing at most once per _HEALTH_TTL_SECONDS."""
+    global _health_cache
+    now = time.monotonic()
+    if _health_cache is not None and now - _health_cache[0] < _HEALTH_TTL_SECONDS:
+        return _health_cache[1]
+
+    vector_store_ready = vector_store_exists()
+    snapshot: dict[str, Any] = {
+        "status": "ok",
+        "groq_model": settings.groq_model,
+        "embedding_model": settings.embedding_model,
+        "vector_store_ready": vector_store_ready,
+        "chunk_size": settings.chunk_size,
+        "retrieval_k": settings.retrieval_k,
+    }
+
+    # total_vectors/index_type are left out (not null) until the index is loadable
+    if vector_store_ready:
+        try:
+            index = get_vector_store().index
+            snapshot["total_vectors"] = index.ntotal
+            snapshot["index_type"] = type(index).__name__
+        except Exception:
+            pass  # non-fatal — store files exist but index may be stale
+    _health_cache = (now, snapshot)
+    return snapshot
+
+
+def _invalidate_health_snapshot() -> None:
+    """Force the next /health call to recompute (called after re-ingestion)."""
+    global _health_cache
+    _health_cache = None
+
+
 @router.get(
     "/health",
-    response_model=HealthResponse,
+    response_model=None,
+    responses={200: {"model": HealthResponse}},
     summary="Health & readiness check",
     description="Returns system status, configuration metadata, and vector store readiness.",
     tags=["System"],
 )
-async def health_check() -> HealthResponse:
-    vector_store_ready = settings.store_path.exists()
-    total_vectors: int | None = None
+async def health_check() -> ORJSONResponse:
+    return ORJSONResponse(_health_snapshot())
 
-    if vector_store_ready:
-        try:
-            from retriever import get_vector_store
-            vs = get_vector_store()
-            total_vectors = vs.index.ntotal
-        except Exception:
-            pass  # non-fatal — store path exists but index may be stale
-
-    return HealthResponse(
-        status="ok",
-        groq_model=settings.groq_model,
-        embedding_model=settings.embedding_model,
-        vector_store_ready=vector_store_ready,
-        total_vectors=total_vectors,
-        chunk_size=settings.chunk_size,
-        retrieval_k=settings.retrieval_k,
-    )
+
+# ══════════════════════════════════════════════════════════════════════════════
+# GET /metrics
+# ══════════════════════════════════════════════════════════════════════════════
+
+@router.get(
+    "/metrics",
+    response_model=None,
+    responses={200: {"model": MetricsResponse}},
+    summary="Answer cache metrics",
+    description="Hit/miss counters for the exact + semantic answer cache in front of /ask.",
+    tags=["System"],
+)
+async def get_metrics() -> Response:
+    stats = get_semantic_cache().stats()
+    return _model_response(MetricsResponse.model_construct(
+        cache_entries=stats["entries"],
+        cache_exact_hits=stats["exact_hits"],
+        cache_semantic_hits=stats["semantic_hits"],
+        cache_misses=stats["misses"],
+        cache_hit_rate=stats["hit_rate"],
+    ))
 
 
 # ══════════════════════════════════════════════════════════════════════════════
@@ -146,7 +391,8 @@ async def health_check() -> HealthResponse:
 
 @router.post(
     "/ingest",
-    response_model=IngestResponse,
+    response_model=None,
+    responses={200: {"model": IngestResponse}},
     summary="Ingest and re-index documents",
     description=(
         "Triggers a full ingestion of the `documents/` folder: load → split → embed → "
@@ -155,23 +401,24 @@ async def health_check() -> HealthResponse:
     ),
     tags=["RAG"],
 )
-async def ingest_documents(force: bool = Query(default=True, description="Force rebuild even if index exists")) -> IngestResponse:
+async def ingest_documents(force: bool = Query(default=True, description="Force rebuild even if index exists")) -> Response:
     try:
-        from ingestor import ingest
-        vectorstore, doc_count = ingest(force_rebuild=force)
+        # Loading, splitting and embedding take seconds — keep the loop free for /ask
+        vectorstore, doc_count = await asyncio.to_thread(ingest, force_rebuild=force)
 
         # Invalidate the cached vector store so next /ask reloads the fresh index
-        from retriever import invalidate_vector_store_cache
         invalidate_vector_store_cache()
+        invalidate_semantic_cache()
+        _invalidate_health_snapshot()
 
         chunks_indexed: int = vectorstore.index.ntotal
         log.info("Ingestion complete — %d docs, %d chunks", doc_count, chunks_indexed)
 
-        return IngestResponse(
+        return _model_response(IngestResponse.model_construct(
             message=f"Ingestion complete. {doc_count} document(s) processed.",
             documents_loaded=doc_count,
             chunks_indexed=chunks_indexed,
-        )
+        ))
     except Exception as exc:
         log.exception("Ingestion failed: %s", exc)
         raise HTTPException(
@@ -184,17 +431,31 @@ async def ingest_documents(force: bool = Query(default=True, description="Force
 # GET /history
 # ══════════════════════════════════════════════════════════════════════════════
 
+def _history_body(limit: int) -> Iterator[bytes]:
+    """Encode {"entries": [...], "total": n} one entry at a time."""
+    yield b'{"entries":['
+    total = 0
+    for entry in hist.iter_recent(n=limit):
+        if total:
+            yield b","
+        yield orjson.dumps(entry)
+        total += 1
+    yield b'],"total":%d}' % total
+
+
 @router.get(
     "/history",
-    response_model=HistoryResponse,
+    response_model=None,
+    responses={200: {"model": HistoryResponse}},
     summary="List recent Q&A interactions",
     tags=["System"],
 )
 async def get_history(
     limit: int = Query(default=10, ge=1, le=100, description="Max number of entries to return"),
-) -> HistoryResponse:
-    entries = hist.get_recent(n=limit)
-    return HistoryResponse(entries=entries, total=len(entries))
+) -> StreamingResponse:
+    # A sync iterator: Starlette pulls it in its threadpool, so the file reads
+    # stay off the event loop and the body is never built whole in memory.
+    return StreamingResponse(_history_body(limit), media_type="application/json")
 
 
 # ══════════════════════════════════════════════════════════════════════════════
@@ -203,16 +464,17 @@ async def get_history(
 
 @router.post(
     "/history/clear",
-    response_model=ClearHistoryResponse,
+    response_model=None,
+    responses={200: {"model": ClearHistoryResponse}},
     summary="Clear all conversation history",
     tags=["System"],
 )
-async def clear_history() -> ClearHistoryResponse:
-    removed = hist.clear()
-    return ClearHistoryResponse(
+async def clear_history() -> Response:
+    removed = await asyncio.to_thread(hist.clear)
+    return _model_response(ClearHistoryResponse.model_construct(
         removed=removed,
         message=f"Cleared {removed} history entry/entries.",
-    )
+    ))
 
 
 # ══════════════════════════════════════════════════════════════════════════════
@@ -221,7 +483,8 @@ async def clear_history() -> ClearHistoryResponse:
 
 @router.delete(
     "/history/{index}",
-    response_model=DeleteHistoryResponse,
+    response_model=None,
+    responses={200: {"model": DeleteHistoryResponse}},
     summary="Delete a single history entry by its index",
     description=(
         "Deletes one entry from the history log by its 0-based position in the "
@@ -229,15 +492,15 @@ async def clear_history() -> ClearHistoryResponse:
     ),
     tags=["System"],
 )
-async def delete_history_entry(index: int) -> DeleteHistoryResponse:
-    deleted = hist.delete_entry(index)
+async def delete_history_entry(index: int) -> Response:
+    deleted = await asyncio.to_thread(hist.delete_entry, index)
     if not deleted:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail=f"History entry at index {index} not found.",
         )
-    return DeleteHistoryResponse(
+    return _model_response(DeleteHistoryResponse.model_construct(
         deleted=True,
         index=index,
         message=f"Entry {index} deleted successfully.",
-    )
+    ))
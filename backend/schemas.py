@@ -9,27 +9,51 @@ Keeping schemas in one file:
   • Simplifies OpenAPI doc generation (FastAPI introspects these).
 """
 
-from typing import Any
-from pydantic import BaseModel, Field
+from typing import Annotated, Literal
+
+from pydantic import BaseModel, ConfigDict, Field, StringConstraints
+# typing_extensions (a pydantic dependency): pydantic needs its TypedDict on Python < 3.12
+from typing_extensions import NotRequired, TypedDict
+
+
+# ── Shared ────────────────────────────────────────────────────────────────────
+
+class _Schema(BaseModel):
+    """Immutable, closed base for every API model — instances are never mutated after build."""
+    model_config = ConfigDict(frozen=True, extra="forbid")
+
+
+class ChatTurn(TypedDict):
+    """One prior conversation turn sent with a follow-up question."""
+    role: Literal["user", "assistant"]
+    content: str
+
+
+class SourceDict(TypedDict):
+    """Fixed-shape source citation as produced by retriever.deduplicate_sources()."""
+    filename: str
+    snippet: str
+    similarity_score: float
+    start_index: NotRequired[int]  # absent when the chunk has no recorded offset
 
 
 # ── Requests ──────────────────────────────────────────────────────────────────
 
-class QuestionRequest(BaseModel):
+class QuestionRequest(_Schema):
     """POST /ask — user question with optional conversation history."""
-    question: str = Field(
+    # Stripped inside pydantic-core before the length checks, so a blank
+    # question is rejected here and handlers never re-strip
+    question: Annotated[str, StringConstraints(strip_whitespace=True, min_length=1, max_length=2000)] = Field(
         ...,
-        min_length=1,
-        max_length=2000,
         description="Natural-language question to answer from the knowledge base",
         examples=["What is Retrieval-Augmented Generation?"],
     )
-    conversation_history: list[dict[str, str]] = Field(
+    conversation_history: list[ChatTurn] = Field(
         default_factory=list,
         description=(
             "Prior conversation turns for follow-up question support. "
             "Format: [{\"role\": \"user\" | \"assistant\", \"content\": \"...\"}]. "
-            "Maximum last 6 turns are used."
+            "The newest turns that fit in HISTORY_TOKEN_BUDGET are used."
         ),
     )
     top_k: int | None = Field(
@@ -40,9 +64,19 @@ class QuestionRequest(BaseModel):
     )
 
 
+class BatchQuestionRequest(_Schema):
+    """POST /ask/batch — several independent questions answered in one call."""
+    questions: list[QuestionRequest] = Field(
+        ...,
+        min_length=1,
+        max_length=20,
+        description="Questions to answer; each accepts the same fields as POST /ask",
+    )
+
+
 # ── Responses ─────────────────────────────────────────────────────────────────
 
-class SourceDocument(BaseModel):
+class SourceDocument(_Schema):
     """One cited source document included in an answer."""
     filename: str = Field(description="Name of the source file")
     snippet: str = Field(description="Relevant excerpt from the document")
@@ -53,11 +87,11 @@ class SourceDocument(BaseModel):
     )
     start_index: int | None = Field(
         default=None,
-        description="Character offset of this chunk in the original document",
+        description="Character offset of this chunk in the original document (omitted if unknown)",
     )
 
 
-class QuestionResponse(BaseModel):
+class QuestionResponse(_Schema):
     """POST /ask — answer with grounded sources and retrieval metadata."""
     question: str
     answer: str
@@ -67,34 +101,42 @@ class QuestionResponse(BaseModel):
     )
 
 
-class HistoryEntry(BaseModel):
+class BatchQuestionResponse(_Schema):
+    """POST /ask/batch — one QuestionResponse per request, in input order."""
+    results: list[QuestionResponse]
+
+
+class HistoryEntry(_Schema):
     """One persisted Q&A interaction."""
+    # Log lines are read back from disk — tolerate keys older versions wrote
+    model_config = ConfigDict(extra="ignore")
+
     timestamp: str
     question: str
     answer: str = ""
-    sources: list[dict[str, Any]] = Field(default_factory=list)
+    sources: list[SourceDict] = Field(default_factory=list)
     chunks_retrieved: int = 0
     error: str | None = None
 
 
-class HistoryResponse(BaseModel):
+class HistoryResponse(_Schema):
     entries: list[HistoryEntry]
     total: int
 
 
-class ClearHistoryResponse(BaseModel):
+class ClearHistoryResponse(_Schema):
     removed: int
     message: str
 
 
-class DeleteHistoryResponse(BaseModel):
+class DeleteHistoryResponse(_Schema):
     """DELETE /history/{index} — result of deleting one entry."""
     deleted: bool
     index: int
     message: str
 
 
-class HealthResponse(BaseModel):
+class HealthResponse(_Schema):
     """GET /health — system readiness."""
     status: str
     groq_model: str
@@ -102,13 +144,26 @@ class HealthResponse(BaseModel):
     vector_store_ready: bool
     total_vectors: int | None = Field(
         default=None,
-        description="Total embeddings in the FAISS index (None if not loaded)",
+        description="Total embeddings in the FAISS index (omitted if not loaded)",
+    )
+    index_type: str | None = Field(
+        default=None,
+        description="FAISS index class serving queries, e.g. IndexHNSWFlat (omitted if not loaded)",
     )
     chunk_size: int
     retrieval_k: int
 
 
-class IngestResponse(BaseModel):
+class MetricsResponse(_Schema):
+    """GET /metrics — answer-cache effectiveness counters."""
+    cache_entries: int
+    cache_exact_hits: int
+    cache_semantic_hits: int
+    cache_misses: int
+    cache_hit_rate: float = Field(description="(exact + semantic hits) / lookups, in [0, 1]")
+
+
+class IngestResponse(_Schema):
     """POST /ingest — ingestion result."""
     message: str
     documents_loaded: int | None = None
@@ -0,0 +1,188 @@
+"""
+semantic_cache.py
+─────────────────
+Answer cache keyed on question text *and* meaning.
+
+How it works:
+  • Exact tier: SHA-256 of the retrieval k + normalised question (stripped,
+    lower-cased) → cached result. A hit costs one dict lookup — no embedding
+    call at all.
+  • Semantic tier: every answered question's embedding is added to a small
+    FAISS IndexFlatIP. On an exact miss the question is embedded and searched;
+    if the best cosine similarity is at or above settings.semantic_cache_threshold
+    the stored answer is returned and retrieval + the LLM call are skipped.
+  • Embeddings are L2-normalised, so inner product == cosine similarity.
+  • A semantic hit must also share enough words with the cached question:
+    Jaccard overlap of the lower-cased token sets ≥ semantic_cache_min_jaccard.
+    This rejects near-identical embeddings of questions that differ in a
+    decisive word ("… in Python" vs "… in Java") without extra model calls.
+  • Every entry records the retrieval k its sources were built with, and only
+    a request resolving to the same k can hit it — a top_k override never gets
+    an answer grounded in a different number of chunks.
+  • Entries expire after settings.semantic_cache_ttl_seconds (0 = never) and the
+    oldest are evicted FIFO once semantic_cache_max_entries is reached.
+  • Hit/miss counters are exposed through GET /api/metrics.
+
+The cache is process-local and cleared after every re-ingestion so answers
+never outlive the index they were grounded in.
+"""
+
+import hashlib
+import re
+import threading
+import time
+from typing import Any
+
+import faiss
+import numpy as np
+
+from config import settings
+from logger import get_logger
+
+log = get_logger(__name__)
+
+
+def _exact_key(question: str, k: int) -> str:
+    return hashlib.sha256(f"{k}\0{question.strip().lower()}".encode("utf-8")).hexdigest()
+
+
+_TOKEN_RE = re.compile(r"\w+")
+
+
+def _tokens(question: str) -> frozenset[str]:
+    return frozenset(_TOKEN_RE.findall(question.lower()))
+
+
+def _jaccard(a: frozenset[str], b: frozenset[str]) -> float:
+    union = len(a | b)
+    return len(a & b) / union if union else 1.0
+
+
+class SemanticCache:
+    """FIFO-bounded exact + nearest-neighbour cache of answered questions."""
+
+    # Nearest neighbours checked per lookup — the closest vector can fail the
+    # lexical check while a slightly farther one passes
+    _CANDIDATES = 4
+
+    def __init__(
+        self,
+        max_entries: int,
+        threshold: float,
+        ttl_seconds: float = 0.0,
+        min_jaccard: float = 0.0,
+    ) -> None:
+        self.max_entries = max_entries
+        self.threshold = threshold
+        self.ttl_seconds = ttl_seconds
+        self.min_jaccard = min_jaccard
+        self._index: faiss.IndexFlatIP | None = None
+        # Parallel to the FAISS rows: {"key", "k", "tokens", "result", "created"}
+        self._entries: list[dict[str, Any]] = []
+        self._by_key: dict[str, dict[str, Any]] = {}
+        self._lock = threading.Lock()
+        self.exact_hits = 0
+        self.semantic_hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def _as_row(vector: list[float]) -> np.ndarray:
+        row = np.array(vector, dtype=np.float32).reshape(1, -1)
+        faiss.normalize_L2(row)
+        return row
+
+    def _fresh(self, entry: dict[str, Any]) -> bool:
+        return not self.ttl_seconds or time.monotonic() - entry["created"] < self.ttl_seconds
+
+    def lookup_exact(self, question: str, k: int) -> dict[str, Any] | None:
+        """Return the cached result for this exact (normalised) question at this k, if fresh."""
+        with self._lock:
+            entry = self._by_key.get(_exact_key(question, k))
+            if entry is None or not self._fresh(entry):
+                return None
+            self.exact_hits += 1
+            log.info("Answer cache hit (exact)")
+            return entry["result"]
+
+    def lookup(self, question: str, vector: list[float], k: int) -> dict[str, Any] | None:
+        """Return the cached result for the closest previous question at this k, if close enough."""
+        tokens = _tokens(question)
+        with self._lock:
+            if self._index is None or self._index.ntotal == 0:
+                self.misses += 1
+                return None
+            n = min(self._CANDIDATES, self._index.ntotal)
+            scores, ids = self._index.search(self._as_row(vector), n)
+            for score, idx in zip(scores[0].tolist(), ids[0].tolist()):
+                if idx < 0 or score < self.threshold:
+                    break  # results are best-first
+                entry = self._entries[idx]
+                if entry["k"] != k or not self._fresh(entry):
+                    continue
+                if _jaccard(tokens, entry["tokens"]) < self.min_jaccard:
+                    continue
+                self.semantic_hits += 1
+                log.info("Semantic cache hit (cosine=%.3f)", score)
+                return entry["result"]
+            self.misses += 1
+            return None
+
+    def add(self, question: str, vector: list[float], result: dict[str, Any], k: int) -> None:
+        """Store a result generated from k retrieved chunks under the question's text and embedding."""
+        row = self._as_row(vector)
+        entry = {
+            "key": _exact_key(question, k),
+            "k": k,
+            "tokens": _tokens(question),
+            "result": result,
+            "created": time.monotonic(),
+        }
+        with self._lock:
+            if self._index is None:
+                self._index = faiss.IndexFlatIP(row.shape[1])
+            if self._index.ntotal >= self.max_entries:
+                # IndexFlat compacts ids on removal, so the list must shift in step
+                self._index.remove_ids(np.array([0], dtype=np.int64))
+                evicted = self._entries.pop(0)
+                if self._by_key.get(evicted["key"]) is evicted:
+                    del self._by_key[evicted["key"]]
+            self._index.add(row)
+            self._entries.append(entry)
+            self._by_key[entry["key"]] = entry
+
+    def clear(self) -> None:
+        with self._lock:
+            self._index = None
+            self._entries = []
+            self._by_key = {}
+
+    def stats(self) -> dict[str, Any]:
+        with self._lock:
+            hits = self.exact_hits + self.semantic_hits
+            lookups = hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "exact_hits": self.exact_hits,
+                "semantic_hits": self.semantic_hits,
+                "misses": self.misses,
+                "hit_rate": round(hits / lookups, 4) if lookups else 0.0,
+            }
+
+
+_cache = SemanticCache(
+    max_entries=settings.semantic_cache_max_entries,
+    threshold=settings.semantic_cache_threshold,
+    ttl_seconds=settings.semantic_cache_ttl_seconds,
+    min_jaccard=settings.semantic_cache_min_jaccard,
+)
+
+
+def get_semantic_cache() -> SemanticCache:
+    """Public accessor for the process-wide semantic cache."""
+    return _cache
+
+
+def invalidate_semantic_cache() -> None:
+    """Drop all cached answers (called after re-ingestion)."""
+    _cache.clear()
+    log.info("Semantic cache invalidated")
@@ -0,0 +1,123 @@
+"""
+sqlite_docstore.py
+──────────────────
+On-disk chunk store that replaces the pickled InMemoryDocstore written by
+FAISS.save_local.
+
+Why:
+  • No pickle — loading the store can never execute code, so the
+    allow_dangerous_deserialization escape hatch is gone.
+  • Rows are read on demand: only the K chunks a query returns become
+    Document objects; the rest stay in SQLite's page cache, which is shared
+    by every worker process instead of living on each worker's heap.
+  • Rows are keyed by FAISS position, so a search result maps to its chunks
+    with one `WHERE pos IN (…)` query and no id-mapping dict in memory.
+
+Layout (docs.sqlite next to index.faiss):
+    docs(pos INTEGER PRIMARY KEY, page_content TEXT, metadata TEXT)  — metadata is JSON
+"""
+
+import os
+import sqlite3
+import threading
+from collections.abc import Iterable, Iterator, Mapping, Sequence
+from pathlib import Path
+
+import orjson
+from langchain_community.docstore.base import Docstore
+from langchain_core.documents import Document
+
+DOCSTORE_FILE = "docs.sqlite"
+
+
+class PositionIds(Mapping[int, str]):
+    """
+    index_to_docstore_id for a SQLiteDocstore: FAISS position i ↔ id "i".
+    Lets LangChain's FAISS wrapper resolve ids without an N-entry dict.
+    """
+
+    def __init__(self, size: int) -> None:
+        self._size = size
+
+    def __getitem__(self, position: int) -> str:
+        if not 0 <= position < self._size:
+            raise KeyError(position)
+        return str(position)
+
+    def __iter__(self) -> Iterator[int]:
+        return iter(range(self._size))
+
+    def __len__(self) -> int:
+        return self._size
+
+
+class SQLiteDocstore(Docstore):
+    """Read-only docstore backed by a docs.sqlite file written at ingest time."""
+
+    def __init__(self, path: Path) -> None:
+        self.path = path
+        self._db = sqlite3.connect(
+            f"file:{path.resolve().as_posix()}?mode=ro", uri=True, check_same_thread=False
+        )
+        # Retrieval runs in worker threads; one connection, serialised access
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _row_to_document(page_content: str, metadata: str) -> Document:
+        return Document(page_content=page_content, metadata=orjson.loads(metadata))
+
+    def search(self, search: str) -> Document | str:
+        """Docstore interface: look up one chunk by its id (the FAISS position as a string)."""
+        found = self.fetch([int(search)])
+        return found.get(int(search), f"ID {search} not found.")
+
+    def fetch(self, positions: Sequence[int]) -> dict[int, Document]:
+        """Fetch the chunks at `positions` in a single query."""
+        if not positions:
+            return {}
+        placeholders = ",".join("?" * len(positions))
+        with self._lock:
+            rows = self._db.execute(
+                f"SELECT pos, page_content, metadata FROM docs WHERE pos IN ({placeholders})",
+                tuple(positions),
+            ).fetchall()
+        return {pos: self._row_to_document(text, meta) for pos, text, meta in rows}
+
+    def iter_documents(self) -> Iterator[tuple[int, Document]]:
+        """Yield (position, Document) for every chunk, in index order."""
+        with self._lock:
+            rows = self._db.execute(
+                "SELECT pos, page_content, metadata FROM docs ORDER BY pos"
+            ).fetchall()
+        for pos, text, meta in rows:
+            yield pos, self._row_to_document(text, meta)
+
+    def __len__(self) -> int:
+        with self._lock:
+            return self._db.execute("SELECT COUNT(*) FROM docs").fetchone()[0]
+
+    def close(self) -> None:
+        with self._lock:
+            self._db.close()
+
+    @staticmethod
+    def write(path: Path, documents: Iterable[Document]) -> None:
+        """Write `documents` to a fresh file at `path`; row i is FAISS position i."""
+        if path.exists():
+            os.remove(path)
+        db = sqlite3.connect(str(path))
+        try:
+            with db:
+                db.execute(
+                    "CREATE TABLE docs (pos INTEGER PRIMARY KEY, page_content TEXT NOT NULL, "
+                    "metadata TEXT NOT NULL)"
+                )
+                db.executemany(
+                    "INSERT INTO docs (pos, page_content, metadata) VALUES (?, ?, ?)",
+                    (
+                        (pos, doc.page_content, orjson.dumps(doc.metadata, default=str).decode())
+                        for pos, doc in enumerate(documents)
+                    ),
+                )
+        finally:
+            db.close()
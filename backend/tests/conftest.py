@@ -0,0 +1,6 @@
+"""Make backend modules importable the way the app imports them (flat, from backend/)."""
+
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
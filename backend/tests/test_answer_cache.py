@@ -0,0 +1,83 @@
+"""
+Answer cache must honour per-request top_k: a cached answer is only reused
+for a request that resolves to the same retrieval k.
+"""
+
+import pytest
+
+pytest.importorskip("faiss")
+pytest.importorskip("langchain_groq")
+
+from langchain_core.messages import AIMessage
+
+import rag_pipeline as rag
+from retriever import RetrievedChunk
+from semantic_cache import invalidate_semantic_cache
+
+
+class _FakeEmbeddings:
+    def embed_query(self, text: str) -> list[float]:
+        return [1.0, 0.0, 0.0]
+
+
+class _FakeLLM:
+    def invoke(self, messages: list) -> AIMessage:
+        return AIMessage(content="An answer.")
+
+
+@pytest.fixture
+def pipeline(monkeypatch):
+    calls: list[int] = []
+
+    def fake_retrieve(question, k=None, embedding=None):
+        calls.append(k)
+        return [
+            RetrievedChunk(
+                content=f"chunk {i}",
+                filename=f"doc{i}.md",
+                source_path=f"documents/doc{i}.md",
+                similarity_score=0.9,
+                start_index=0,
+            )
+            for i in range(k)
+        ]
+
+    monkeypatch.setattr(rag.settings, "enable_semantic_cache", True)
+    monkeypatch.setattr(rag, "get_embeddings", lambda: _FakeEmbeddings())
+    monkeypatch.setattr(rag, "_build_llm", lambda: _FakeLLM())
+    monkeypatch.setattr(rag, "retrieve", fake_retrieve)
+    invalidate_semantic_cache()
+    yield calls
+    invalidate_semantic_cache()
+
+
+def test_same_question_with_different_top_k_is_not_shared(pipeline):
+    question = "What is Retrieval-Augmented Generation?"
+
+    assert rag.ask(question, top_k=1)["chunks_retrieved"] == 1
+    assert rag.ask(question, top_k=3)["chunks_retrieved"] == 3
+    assert pipeline == [1, 3]
+
+    # Repeats are still served from the cache, each under its own k
+    assert rag.ask(question, top_k=1)["chunks_retrieved"] == 1
+    assert rag.ask(question, top_k=3)["chunks_retrieved"] == 3
+    assert pipeline == [1, 3]
+
+
+# Differs from the question above in case and punctuation only, so it misses the
+# exact tier but has the same tokens (and, with _FakeEmbeddings, the same vector)
+PARAPHRASE = "what is retrieval augmented generation"
+
+
+def test_semantic_hit_at_same_top_k(pipeline):
+    hits = rag.get_semantic_cache().semantic_hits
+    assert rag.ask("What is Retrieval-Augmented Generation?", top_k=2)["chunks_retrieved"] == 2
+    assert rag.ask(PARAPHRASE, top_k=2)["chunks_retrieved"] == 2
+    assert pipeline == [2]
+    assert rag.get_semantic_cache().semantic_hits == hits + 1
+
+
+def test_semantic_miss_at_different_top_k(pipeline):
+    assert rag.ask("What is Retrieval-Augmented Generation?", top_k=1)["chunks_retrieved"] == 1
+    assert rag.ask(PARAPHRASE, top_k=3)["chunks_retrieved"] == 3
+    assert pipeline == [1, 3]
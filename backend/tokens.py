@@ -0,0 +1,34 @@
+"""
+tokens.py
+─────────
+Cheap token counting for prompt budgeting (retrieved context, chat history).
+
+Uses tiktoken's o200k/cl100k BPE — not Llama's tokenizer, but within a few
+percent for English text, which is all a budget needs. If tiktoken is not
+installed or its BPE file cannot be fetched (offline hosts), falls back to the
+usual ~4 characters per token estimate.
+"""
+
+from functools import lru_cache
+
+from logger import get_logger
+
+log = get_logger(__name__)
+
+
+@lru_cache(maxsize=1)
+def _encoder():
+    try:
+        import tiktoken
+        return tiktoken.encoding_for_model("gpt-4o-mini")
+    except Exception as exc:  # ImportError, or network failure fetching the BPE
+        log.warning("tiktoken unavailable — estimating tokens as chars/4: %s", exc)
+        return None
+
+
+def count_tokens(text: str) -> int:
+    """Return the (approximate) number of tokens in text."""
+    enc = _encoder()
+    if enc is None:
+        return max(1, len(text) // 4)
+    return len(enc.encode(text, disallowed_special=()))